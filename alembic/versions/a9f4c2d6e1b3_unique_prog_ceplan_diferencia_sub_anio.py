@@ -0,0 +1,31 @@
+"""unique_prog_ceplan_diferencia_sub_anio
+
+Revision ID: a9f4c2d6e1b3
+Revises: e7c3b5a1f980
+Create Date: 2026-08-26 18:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9f4c2d6e1b3'
+down_revision: Union[str, None] = 'e7c3b5a1f980'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_prog_ceplan_subproducto_anio', table_name='programaciones_ceplan')
+    op.create_index('ix_prog_ceplan_subproducto_anio', 'programaciones_ceplan', ['id_subproducto', 'anio'], unique=True)
+    op.create_index('ix_diferencia_subproducto_anio', 'diferencias', ['id_subproducto', 'anio'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_diferencia_subproducto_anio', table_name='diferencias')
+    op.drop_index('ix_prog_ceplan_subproducto_anio', table_name='programaciones_ceplan')
+    op.create_index('ix_prog_ceplan_subproducto_anio', 'programaciones_ceplan', ['id_subproducto', 'anio'], unique=False)
@@ -0,0 +1,37 @@
+"""add_composite_indexes
+
+Revision ID: d41f0a9b27c6
+Revises: c8d2b0e4a77a
+Create Date: 2026-08-26 09:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f0a9b27c6'
+down_revision: Union[str, None] = 'c8d2b0e4a77a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_ppr_codigo_anio', 'pprs', ['codigo_ppr', 'anio'], unique=True)
+    op.create_index('ix_producto_ppr_codigo', 'productos', ['id_ppr', 'codigo_producto'], unique=False)
+    op.create_index('ix_actividad_producto_codigo', 'actividades', ['id_producto', 'codigo_actividad'], unique=False)
+    op.create_index('ix_subproducto_actividad_codigo', 'subproductos', ['id_actividad', 'codigo_subproducto'], unique=False)
+    op.create_index('ix_prog_ppr_subproducto_anio', 'programaciones_ppr', ['id_subproducto', 'anio'], unique=False)
+    op.create_index('ix_prog_ceplan_subproducto_anio', 'programaciones_ceplan', ['id_subproducto', 'anio'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_prog_ceplan_subproducto_anio', table_name='programaciones_ceplan')
+    op.drop_index('ix_prog_ppr_subproducto_anio', table_name='programaciones_ppr')
+    op.drop_index('ix_subproducto_actividad_codigo', table_name='subproductos')
+    op.drop_index('ix_actividad_producto_codigo', table_name='actividades')
+    op.drop_index('ix_producto_ppr_codigo', table_name='productos')
+    op.drop_index('ix_ppr_codigo_anio', table_name='pprs')
@@ -0,0 +1,29 @@
+"""unique_prog_ppr_subproducto_anio
+
+Revision ID: e7c3b5a1f980
+Revises: d41f0a9b27c6
+Create Date: 2026-08-26 10:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c3b5a1f980'
+down_revision: Union[str, None] = 'd41f0a9b27c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_prog_ppr_subproducto_anio', table_name='programaciones_ppr')
+    op.create_index('ix_prog_ppr_subproducto_anio', 'programaciones_ppr', ['id_subproducto', 'anio'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_prog_ppr_subproducto_anio', table_name='programaciones_ppr')
+    op.create_index('ix_prog_ppr_subproducto_anio', 'programaciones_ppr', ['id_subproducto', 'anio'], unique=False)
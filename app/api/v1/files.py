@@ -1,13 +1,19 @@
+import asyncio
 import shutil
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from fastapi.responses import JSONResponse
+import time
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from typing import Optional, List
 import pandas as pd
 import os
 from pathlib import Path
 from datetime import datetime
 import hashlib
-import json
+from functools import lru_cache
+import orjson
+import pygtrie
+import uuid
 
 from app.core.security import get_current_active_user
 from app.core.rbac import require_responsable_ppr, require_responsable_planificacion
@@ -15,7 +21,11 @@ from app.models.user import User
 from app.models.ppr import PPR, Producto, Actividad, Subproducto
 from app.models.programacion import ProgramacionPPR
 from app.core.database import get_session
+from app.core import preview_store
+from app.models.constants import MONTHS
 from sqlmodel import Session, select
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import selectinload
 import re
 from app.core.logging_config import get_logger
 
@@ -24,22 +34,23 @@ from app.services.extractor_service import ppr_extractor_service, ceplan_extract
 
 logger = get_logger(__name__)
 
-def clean_nan_values(obj):
-    """
-    Recursively clean NaN values from a data structure to make it JSON serializable
-    """
-    if isinstance(obj, dict):
-        return {key: clean_nan_values(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_nan_values(item) for item in obj]
-    elif pd.isna(obj) or obj is pd.NA or (isinstance(obj, float) and (obj != obj)):  # obj != obj is True for NaN
-        return None  # or 0, depending on your preference
-    elif isinstance(obj, float) and (obj == float('inf') or obj == float('-inf')):
-        return None  # or a large number depending on your preference
-    else:
-        return obj
+# Formato UUID canónico de los preview_id
+_UUID_RE = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
 
 
+# Columnas mensuales de ProgramacionCEPLAN, en el orden de MONTHS
+CEPLAN_MONTH_FIELDS = tuple(f"prog_{m}" for m in MONTHS) + tuple(f"ejec_{m}" for m in MONTHS)
+
+
+@lru_cache(maxsize=4096)
+def _norm(code: str) -> str:
+    """
+    Normaliza un código quitando los ceros a la izquierda.
+
+    Memoizado: las cargas mensuales repiten los mismos códigos archivo tras
+    archivo, y tener la regla en un solo lugar permite cambiarla atómicamente.
+    """
+    return code.lstrip('0')
 
 
 router = APIRouter()
@@ -50,6 +61,28 @@ def get_file_hash(file_content: bytes) -> str:
     return hashlib.sha256(file_content).hexdigest()
 
 
+def _write_file(path: Path, data: bytes) -> None:
+    """Escribir los bytes del archivo subido a disco (ejecutado en threadpool)"""
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+async def _hash_and_store(file_content: bytes, upload_dir: Path, filename: str) -> tuple:
+    """
+    Calcula el hash y escribe el archivo a disco en paralelo (ambos operan
+    sobre los mismos bytes), luego renombra al nombre definitivo con hash.
+    Devuelve (file_path, file_hash).
+    """
+    tmp_path = upload_dir / f"tmp_{uuid.uuid4().hex}_{filename}"
+    file_hash, _ = await asyncio.gather(
+        run_in_threadpool(get_file_hash, file_content),
+        run_in_threadpool(_write_file, tmp_path, file_content),
+    )
+    file_path = upload_dir / f"{file_hash}_{filename}"
+    tmp_path.replace(file_path)
+    return file_path, file_hash
+
+
 @router.post("/ppr")
 async def upload_ppr(
     file: UploadFile = File(...),
@@ -79,28 +112,17 @@ async def upload_ppr(
             detail="El archivo es demasiado grande. Máximo permitido: 100MB"
         )
     
-    # Verificar si el archivo ya ha sido subido antes (por hash)
-    file_hash = get_file_hash(file_content)
-    # Aquí podríamos verificar si ya existe en la base de datos
-    
-    # Guardar archivo temporalmente
+    # Guardar archivo y calcular hash en paralelo
     upload_dir = Path("uploads/ppr")
     upload_dir.mkdir(parents=True, exist_ok=True)
-    file_path = upload_dir / f"{file_hash}_{file.filename}"
-    
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    
+    file_path, file_hash = await _hash_and_store(file_content, upload_dir, file.filename)
+
     try:
         # Use the new extraction service to parse the PPR file with complete hierarchical structure
         # This extracts: PPR → Productos → Actividades → Subproductos → Unidad de Medida → Programación/Ejecución por mes
-        ppr_data = ppr_extractor_service.extract_ppr_from_file(file_path)
-        
-        # Store the parsed data temporarily for preview
-        # In a production system, you'd want to store this in a temporary table or cache
-        import json
-        import uuid
-        
+        # The parse is CPU/IO bound, so run it in the threadpool to keep the event loop free
+        ppr_data = await run_in_threadpool(ppr_extractor_service.extract_ppr_from_file, file_path)
+
         # Add upload metadata
         ppr_data_with_metadata = {
             "filename": file.filename,
@@ -111,21 +133,13 @@ async def upload_ppr(
             "ppr_data": ppr_data  # Include the parsed PPR data with complete hierarchy
         }
         
-        # Clean the data structure to handle NaN and other non-JSON-serializable values
-        cleaned_ppr_data = clean_data_for_json(ppr_data_with_metadata)
-        
-        # Create a temporary storage directory
-        temp_dir = Path("temp/uploads")
-        temp_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate a unique ID for this upload
+        # Generate a unique ID for this upload and persist the preview in the
+        # SQLite store (orjson emits null for NaN/Inf, so no pre-cleaning pass
+        # is needed)
         preview_id = str(uuid.uuid4())
-        temp_file_path = temp_dir / f"{preview_id}.json"
-        
-        # Custom encoder to handle NaN, infinity, and other non-JSON-serializable values
-        json_data = json.dumps(cleaned_ppr_data, ensure_ascii=False, indent=2, default=str, allow_nan=False)
-        with open(temp_file_path, 'w', encoding='utf-8') as f:
-            f.write(json_data)
+        raw_preview = preview_store.save_preview(preview_id, ppr_data_with_metadata)
+
+        cleaned_ppr_data = orjson.loads(raw_preview)
         
         logger.info(f"PPR file parsed successfully with complete hierarchical structure: {preview_id}")
         return {
@@ -147,40 +161,6 @@ async def upload_ppr(
         )
 
 
-def clean_data_for_json(obj):
-    """
-    Recursively clean data to make it JSON serializable by handling NaN, infinity, etc.
-    """
-    import pandas as pd
-    import math
-    
-    if isinstance(obj, dict):
-        return {key: clean_data_for_json(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_data_for_json(item) for item in obj]
-    elif isinstance(obj, float):
-        if pd.isna(obj) or obj != obj:  # Check for NaN (NaN != NaN is True)
-            return 0  # Convert NaN to 0
-        elif math.isinf(obj):
-            return 0  # Convert infinity to 0
-        else:
-            return obj
-    elif pd.isna(obj):  # Check for pandas NaN
-        return 0  # Convert to 0
-    elif obj is pd.NaT:  # Check for pandas NaT (Not a Time)
-        return 0  # Convert to 0
-    else:
-        # For other types, try to convert to basic Python types to ensure JSON compatibility
-        try:
-            # If it's numpy type, convert to Python native type
-            if hasattr(obj, 'item'):
-                return clean_data_for_json(obj.item())
-            return obj
-        except:
-            # If conversion fails, convert to string as fallback
-            return str(obj)
-
-
 @router.get("/preview/{preview_id}")
 async def get_extract_preview(
     preview_id: str,
@@ -193,36 +173,28 @@ async def get_extract_preview(
         logger.info(f"User {current_user.nombre} ({current_user.email}) requesting preview for ID: {preview_id}")
         
         # Verify the preview_id is a valid UUID format
-        import uuid
-        try:
-            uuid.UUID(preview_id)
-        except ValueError:
+        if not _UUID_RE.match(preview_id):
             logger.warning(f"Invalid preview ID format: {preview_id} by user {current_user.email}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="ID de vista previa inválido"
             )
-        
-        # Path to the temporary JSON file
-        temp_file_path = Path(f"temp/uploads/{preview_id}.json")
-        
-        if not temp_file_path.exists():
-            logger.warning(f"Preview file not found for ID: {preview_id} by user {current_user.email}")
+
+        # Leer el blob tal cual del almacén y empalmarlo en el sobre que
+        # esperan los clientes, sin re-parsear ni re-serializar
+        raw_preview = preview_store.load_preview(preview_id)
+        if raw_preview is None:
+            logger.warning(f"Preview not found for ID: {preview_id} by user {current_user.email}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Vista previa no encontrada"
             )
-        
-        # Read and return the preview data
-        with open(temp_file_path, 'r', encoding='utf-8') as f:
-            preview_data = json.load(f)
-        
+
         logger.info(f"Successfully retrieved preview for ID: {preview_id} by user {current_user.email}")
-        return {
-            "preview_id": preview_id,
-            "data": preview_data,
-            "message": "Vista previa obtenida exitosamente"
-        }
+        envelope = b'{"preview_id": "%s", "data": %s, "message": "Vista previa obtenida exitosamente"}' % (
+            preview_id.encode('ascii'), raw_preview
+        )
+        return Response(content=envelope, media_type="application/json")
         
     except HTTPException:
         raise
@@ -237,6 +209,7 @@ async def get_extract_preview(
 @router.post("/commit/{preview_id}")
 async def commit_extract(
     preview_id: str,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(require_responsable_ppr),
     session: Session = Depends(get_session)
 ):
@@ -247,35 +220,28 @@ async def commit_extract(
         logger.info(f"User {current_user.nombre} ({current_user.email}) attempting to commit preview ID: {preview_id}")
         
         # Verify the preview_id is a valid UUID format
-        import uuid
-        try:
-            uuid.UUID(preview_id)
-        except ValueError:
+        if not _UUID_RE.match(preview_id):
             logger.warning(f"Invalid commit ID format: {preview_id} by user {current_user.email}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="ID de vista previa inválido"
             )
-        
-        # Path to the temporary JSON file
-        temp_file_path = Path(f"temp/uploads/{preview_id}.json")
-        
-        if not temp_file_path.exists():
-            logger.warning(f"Commit file not found for ID: {preview_id} by user {current_user.email}")
+
+        # Read the preview payload from the store
+        raw_preview = preview_store.load_preview(preview_id)
+        if raw_preview is None:
+            logger.warning(f"Commit preview not found for ID: {preview_id} by user {current_user.email}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Vista previa no encontrada"
             )
-        
-        # Read the preview data
-        with open(temp_file_path, 'r', encoding='utf-8') as f:
-            preview_data = json.load(f)
-        
+        preview_data = orjson.loads(raw_preview)
+
         # Process and update the PPR programación data in the database
         ppr_result = await update_values_ppr(preview_data, session, current_user)
         
-        # Remove the temporary file after successful commit
-        temp_file_path.unlink()
+        # Remove the preview after the response is sent
+        background_tasks.add_task(preview_store.delete_preview, preview_id)
         
         logger.info(f"Successfully committed PPR data from preview ID: {preview_id} by user {current_user.email}")
         return {
@@ -386,7 +352,29 @@ async def store_ppr_data(preview_data, session, current_user):
             ppr_id = new_ppr.id_ppr
             
         logger.info(f"PPR ID: {ppr_id}")
-        
+
+        # Preload the whole existing hierarchy in one eager-loaded query (one SQL per level)
+        # and index it by code, so the loops below do dict lookups instead of per-row SELECTs
+        prod_by_code = {}
+        act_by_code = {}
+        sub_by_code = {}
+        ppr_tree = session.exec(
+            select(PPR)
+            .options(
+                selectinload(PPR.productos)
+                .selectinload(Producto.actividades)
+                .selectinload(Actividad.subproductos)
+            )
+            .where(PPR.id_ppr == ppr_id)
+        ).first()
+        if ppr_tree:
+            for prod in ppr_tree.productos:
+                prod_by_code[prod.codigo_producto] = prod
+                for act in prod.actividades:
+                    act_by_code[(prod.id_producto, act.codigo_actividad)] = act
+                    for sub in act.subproductos:
+                        sub_by_code[(act.id_actividad, sub.codigo_subproducto)] = sub
+
         # Process products, activities, and subproducts
         productos_data = preview_data.get('ppr_data', {}).get('productos', [])
         if not productos_data:
@@ -407,11 +395,8 @@ async def store_ppr_data(preview_data, session, current_user):
             logger.info(f"  Processing product: {producto_codigo} - {producto_nombre}")
             
             # Check if product exists for this PPR
-            existing_producto = session.exec(
-                select(Producto)
-                .where(Producto.codigo_producto == producto_codigo, Producto.id_ppr == ppr_id)
-            ).first()
-            
+            existing_producto = prod_by_code.get(producto_codigo)
+
             if existing_producto:
                 logger.info(f"    Updating existing product: {existing_producto.nombre_producto}")
                 existing_producto.nombre_producto = producto_nombre
@@ -428,6 +413,7 @@ async def store_ppr_data(preview_data, session, current_user):
                 session.add(new_producto)
                 session.flush()
                 producto_id = new_producto.id_producto
+                prod_by_code[producto_codigo] = new_producto
             
             processed_products += 1
             
@@ -446,11 +432,8 @@ async def store_ppr_data(preview_data, session, current_user):
                 logger.info(f"      Processing activity: {actividad_codigo} - {actividad_nombre}")
                 
                 # Check if activity exists for this product
-                existing_actividad = session.exec(
-                    select(Actividad)
-                    .where(Actividad.codigo_actividad == actividad_codigo, Actividad.id_producto == producto_id)
-                ).first()
-                
+                existing_actividad = act_by_code.get((producto_id, actividad_codigo))
+
                 if existing_actividad:
                     logger.info(f"        Updating existing activity: {existing_actividad.nombre_actividad}")
                     existing_actividad.nombre_actividad = actividad_nombre
@@ -467,6 +450,7 @@ async def store_ppr_data(preview_data, session, current_user):
                     session.add(new_actividad)
                     session.flush()
                     actividad_id = new_actividad.id_actividad
+                    act_by_code[(producto_id, actividad_codigo)] = new_actividad
                 
                 # Process subproducts
                 subproductos_data = actividad_data.get('subproductos', [])
@@ -485,11 +469,8 @@ async def store_ppr_data(preview_data, session, current_user):
                     logger.info(f"          Processing subproduct: {subproducto_codigo} - {subproducto_nombre}")
                     
                     # Check if subproduct exists for this activity
-                    existing_subproducto = session.exec(
-                        select(Subproducto)
-                        .where(Subproducto.codigo_subproducto == subproducto_codigo, Subproducto.id_actividad == actividad_id)
-                    ).first()
-                    
+                    existing_subproducto = sub_by_code.get((actividad_id, subproducto_codigo))
+
                     if existing_subproducto:
                         logger.info(f"            Updating existing subproduct: {existing_subproducto.nombre_subproducto}")
                         existing_subproducto.nombre_subproducto = subproducto_nombre
@@ -508,7 +489,8 @@ async def store_ppr_data(preview_data, session, current_user):
                         session.add(new_subproducto)
                         session.flush()
                         subproducto_id = new_subproducto.id_subproducto
-                        
+                        sub_by_code[(actividad_id, subproducto_codigo)] = new_subproducto
+
                         # Create the corresponding programación entries
                         programado_data = subproducto_data.get('programado', {})
                         ejecutado_data = subproducto_data.get('ejecutado', {})
@@ -632,7 +614,7 @@ async def update_values_ppr(preview_data, session, current_user):
         
         # Create maps for quick lookup by both original code and normalized code (leading zeros stripped)
         subproducto_map = {sub.codigo_subproducto: sub for sub in all_subproductos}
-        subproducto_normalized_map = {sub.codigo_subproducto.lstrip('0'): sub for sub in all_subproductos}
+        subproducto_normalized_map = {_norm(sub.codigo_subproducto): sub for sub in all_subproductos}
         logger.info(f"Created lookup maps with {len(subproducto_map)} existing subproducts (original) and {len(subproducto_normalized_map)} normalized codes.")
         
         updated_count = 0
@@ -667,11 +649,11 @@ async def update_values_ppr(preview_data, session, current_user):
                         
                         # If not found with exact match, try normalized match (stripping leading zeros)
                         if not existing_subproducto:
-                            normalized_codigo = subproducto_codigo.lstrip('0')
+                            normalized_codigo = _norm(subproducto_codigo)
                             existing_subproducto = subproducto_normalized_map.get(normalized_codigo)
                         
                         if not existing_subproducto:
-                            logger.warning(f"Subproduct with code '{subproducto_codigo}' not found in database (tried normalized as '{subproducto_codigo.lstrip('0')}'). Will be added to unmatched list.")
+                            logger.warning(f"Subproduct with code '{subproducto_codigo}' not found in database (tried normalized as '{_norm(subproducto_codigo)}'). Will be added to unmatched list.")
                             unmatched_codes.append(subproducto_codigo)
                             continue
                         
@@ -790,16 +772,12 @@ async def upload_ceplan(
         file_size = len(file_content)
         total_size += file_size
         
-        # Generar hash y guardar
-        file_hash = get_file_hash(file_content)
-        file_path = upload_dir / f"{file_hash}_{file.filename}"
-        
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-            
+        # Guardar archivo y calcular hash en paralelo
+        file_path, file_hash = await _hash_and_store(file_content, upload_dir, file.filename)
+
         try:
-            # Extraer datos de este archivo
-            ceplan_data = ceplan_extractor_service.extract_ceplan_from_file(file_path)
+            # Extraer datos de este archivo (en threadpool para no bloquear el event loop)
+            ceplan_data = await run_in_threadpool(ceplan_extractor_service.extract_ceplan_from_file, file_path)
             
             # Acumular subproductos (ceplan_extractor_service devuelve un dict con la lista 'subproductos')
             file_subproductos = ceplan_data.get('subproductos', [])
@@ -840,22 +818,13 @@ async def upload_ceplan(
     }
     
     try:
-        # Clean the data structure to handle NaN and other non-JSON-serializable values
-        cleaned_ceplan_info = clean_data_for_json(consolidated_info)
-        
-        # Create a temporary storage directory
-        temp_dir = Path("temp/uploads")
-        temp_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate a unique ID for this unified upload
-        import uuid
+        # Generate a unique ID for this unified upload and persist the
+        # preview in the SQLite store (orjson emits null for NaN/Inf, so no
+        # pre-cleaning pass is needed)
         preview_id = str(uuid.uuid4())
-        temp_file_path = temp_dir / f"{preview_id}.json"
-        
-        # Custom encoder to handle NaN, infinity, and other non-JSON-serializable values
-        json_data = json.dumps(cleaned_ceplan_info, ensure_ascii=False, indent=2, default=str, allow_nan=False)
-        with open(temp_file_path, 'w', encoding='utf-8') as f:
-            f.write(json_data)
+        raw_preview = preview_store.save_preview(preview_id, consolidated_info)
+
+        cleaned_ceplan_info = orjson.loads(raw_preview)
         
         logger.info(f"Lote de archivos CEPLAN procesado y consolidado: {preview_id} (Total subproductos: {len(all_subproductos)})")
         return {
@@ -875,9 +844,84 @@ async def upload_ceplan(
 
 
 from app.models.programacion import ProgramacionCEPLAN
-async def store_ceplan_data(preview_data, session, current_user):
+
+# Sentencias precompiladas para la escritura masiva de CEPLAN: se construyen
+# una sola vez al importar el módulo y se ejecutan con bindings executemany,
+# evitando recompilar el SQL en cada commit.
+_CEPLAN_INSERT_STMT = insert(ProgramacionCEPLAN)
+# UPDATE masivo por clave primaria (cada dict de parámetros lleva
+# id_prog_ceplan más las columnas a actualizar): la variante con WHERE de
+# bindparam rechaza sincronizar los objetos persistentes de existing_map
+_CEPLAN_UPDATE_STMT = update(ProgramacionCEPLAN)
+
+# Filas por lote del INSERT masivo: 26 columnas por fila mantiene cada
+# sentencia reescrita muy por debajo del max_allowed_packet típico
+_INSERT_BATCH_SIZE = 5000
+
+# Lookaside cache del mapa de subproductos usado por store_ceplan_data.
+# Guarda solo (id_subproducto, codigo_subproducto) por codigo normalizado para
+# no releer toda la tabla en cada commit; se invalida por TTL o cuando se
+# muta un Subproducto (hooks ORM mas abajo).
+_SUBPROD_CACHE_TTL_SECONDS = 300
+_subproducto_cache = {}
+_subproducto_cache_ts = 0.0
+
+
+def _get_subproducto_map(session: Session) -> pygtrie.CharTrie:
+    """Trie codigo_normalizado -> (id_subproducto, codigo_subproducto), con cache TTL"""
+    global _subproducto_cache, _subproducto_cache_ts
+    now = time.monotonic()
+    if _subproducto_cache and now - _subproducto_cache_ts < _SUBPROD_CACHE_TTL_SECONDS:
+        return _subproducto_cache
+    # Solo se necesitan id y código: proyectar columnas evita materializar
+    # instancias ORM completas de todos los subproductos
+    rows = session.exec(
+        select(Subproducto.id_subproducto, Subproducto.codigo_subproducto)
+    ).all()
+    trie = pygtrie.CharTrie()
+    for id_subproducto, codigo_subproducto in rows:
+        trie[_norm(codigo_subproducto)] = (id_subproducto, codigo_subproducto)
+    _subproducto_cache = trie
+    _subproducto_cache_ts = now
+    return _subproducto_cache
+
+
+# Los códigos de subproducto válidos tienen al menos 5 dígitos; un prefijo más
+# corto no identifica un subproducto de forma confiable
+_MIN_PREFIX_MATCH_LEN = 5
+
+
+def _match_subproducto(trie, normalized_code):
+    """
+    Busca el código normalizado en el trie: primero coincidencia exacta y,
+    si no existe, el prefijo coincidente más largo (códigos CEPLAN con
+    variantes de sufijo que antes se descartaban con un warning).
+    """
+    if not normalized_code:
+        return None
+    match = trie.get(normalized_code)
+    if match:
+        return match
+    step = trie.longest_prefix(normalized_code)
+    if step and len(step.key) >= _MIN_PREFIX_MATCH_LEN:
+        return step.value
+    return None
+
+
+@event.listens_for(Subproducto, "after_insert")
+@event.listens_for(Subproducto, "after_update")
+@event.listens_for(Subproducto, "after_delete")
+def _invalidate_subproducto_cache(mapper, connection, target):
+    global _subproducto_cache_ts
+    _subproducto_cache_ts = 0.0
+
+
+def store_ceplan_data(preview_data, session, current_user):
     """
     Store the parsed CEPLAN data into the database, with robust subproduct matching.
+
+    Función síncrona a propósito: el llamador la ejecuta en el threadpool para
+    no bloquear el event loop durante la escritura masiva.
     """
     try:
         ceplan_data = preview_data.get('ceplan_data', {})
@@ -890,87 +934,129 @@ async def store_ceplan_data(preview_data, session, current_user):
             return {"processed_count": 0, "message": "No se encontraron subproductos en los datos de CEPLAN."}
 
         # --- Robust Matching Logic ---
-        # 1. Fetch all existing subproducts and create a normalized lookup map.
-        all_subproductos = session.exec(select(Subproducto)).all()
+        # 1. Get the normalized lookup map (cached across requests with a TTL).
         # The map's key is the code with leading zeros stripped.
-        subproducto_map = {sub.codigo_subproducto.lstrip('0'): sub for sub in all_subproductos}
-        logger.info(f"Created a lookup map with {len(subproducto_map)} normalized subproduct codes.")
+        subproducto_map = _get_subproducto_map(session)
+        logger.info(f"Using a lookup map with {len(subproducto_map)} normalized subproduct codes.")
 
-        processed_count = 0
+        # 2. Batch-fetch the existing ProgramacionCEPLAN rows in one query instead of
+        # one SELECT per incoming subproduct: collect the matched ids/years first,
+        # then index the results by (id_subproducto, anio).
+        default_anio = datetime.now().year
+        matched_ids = set()
+        anios = set()
         for subproducto_data in subproductos_data:
             codigo_ceplan = str(subproducto_data.get('codigo_subproducto', '')).strip()
-            if not codigo_ceplan:
-                continue
+            sub = _match_subproducto(subproducto_map, _norm(codigo_ceplan))
+            if sub:
+                matched_ids.add(sub[0])
+                anios.add(subproducto_data.get('anio', default_anio))
 
-            # 2. Normalize the incoming CEPLAN code.
-            normalized_code = codigo_ceplan.lstrip('0')
-            
-            # 3. Find the match in the map.
-            existing_subproducto = subproducto_map.get(normalized_code)
-            
-            if not existing_subproducto:
-                logger.warning(f"Subproducto de CEPLAN con código '{codigo_ceplan}' (normalizado: '{normalized_code}') no encontrado en la base de datos. Se omitirá.")
-                continue
+        existing_map = {}
+        if matched_ids:
+            existing_rows = session.exec(
+                select(ProgramacionCEPLAN)
+                .where(ProgramacionCEPLAN.id_subproducto.in_(matched_ids),
+                       ProgramacionCEPLAN.anio.in_(anios))
+            ).all()
+            existing_map = {(r.id_subproducto, r.anio): r for r in existing_rows}
 
-            logger.info(f"Match found: CEPLAN code '{codigo_ceplan}' matches DB code '{existing_subproducto.codigo_subproducto}'. Storing data.")
+        processed_count = 0
+        skipped_count = 0
+        # Filas nuevas indexadas por (id_subproducto, anio): un subproducto
+        # repetido dentro del lote consolidado sobreescribe la fila anterior
+        # (last-wins) en lugar de chocar con el índice único en el INSERT
+        insert_by_key = {}
+        rows_to_update = []
+        # no_autoflush: las filas de existing_map siguen en la sesión y un
+        # flush implícito a mitad del bucle emitiría SQL innecesario
+        with session.no_autoflush:
+            # 3. Emparejar cada fila entrante y acumular sus 24 valores crudos;
+            # la conversión a float se hace después de forma vectorizada.
+            pending = []
+            raw_values = []
+            for subproducto_data in subproductos_data:
+                codigo_ceplan = str(subproducto_data.get('codigo_subproducto', '')).strip()
+                if not codigo_ceplan:
+                    continue
 
-            anio = subproducto_data.get('anio', datetime.now().year)
-            existing_ceplan = session.exec(
-                select(ProgramacionCEPLAN)
-                .where(ProgramacionCEPLAN.id_subproducto == existing_subproducto.id_subproducto, 
-                       ProgramacionCEPLAN.anio == anio)
-            ).first()
-            
-            programado_data = subproducto_data.get('programado', {})
-            ejecutado_data = subproducto_data.get('ejecutado', {})
-            
-            # Prepare data dictionary
-            ceplan_fields = {
-                "prog_ene": safe_convert_to_float(programado_data.get('ene', 0)),
-                "ejec_ene": safe_convert_to_float(ejecutado_data.get('ene', 0)),
-                "prog_feb": safe_convert_to_float(programado_data.get('feb', 0)),
-                "ejec_feb": safe_convert_to_float(ejecutado_data.get('feb', 0)),
-                "prog_mar": safe_convert_to_float(programado_data.get('mar', 0)),
-                "ejec_mar": safe_convert_to_float(ejecutado_data.get('mar', 0)),
-                "prog_abr": safe_convert_to_float(programado_data.get('abr', 0)),
-                "ejec_abr": safe_convert_to_float(ejecutado_data.get('abr', 0)),
-                "prog_may": safe_convert_to_float(programado_data.get('may', 0)),
-                "ejec_may": safe_convert_to_float(ejecutado_data.get('may', 0)),
-                "prog_jun": safe_convert_to_float(programado_data.get('jun', 0)),
-                "ejec_jun": safe_convert_to_float(ejecutado_data.get('jun', 0)),
-                "prog_jul": safe_convert_to_float(programado_data.get('jul', 0)),
-                "ejec_jul": safe_convert_to_float(ejecutado_data.get('jul', 0)),
-                "prog_ago": safe_convert_to_float(programado_data.get('ago', 0)),
-                "ejec_ago": safe_convert_to_float(ejecutado_data.get('ago', 0)),
-                "prog_sep": safe_convert_to_float(programado_data.get('sep', 0)),
-                "ejec_sep": safe_convert_to_float(ejecutado_data.get('sep', 0)),
-                "prog_oct": safe_convert_to_float(programado_data.get('oct', 0)),
-                "ejec_oct": safe_convert_to_float(ejecutado_data.get('oct', 0)),
-                "prog_nov": safe_convert_to_float(programado_data.get('nov', 0)),
-                "ejec_nov": safe_convert_to_float(ejecutado_data.get('nov', 0)),
-                "prog_dic": safe_convert_to_float(programado_data.get('dic', 0)),
-                "ejec_dic": safe_convert_to_float(ejecutado_data.get('dic', 0)),
-            }
-
-            if existing_ceplan:
-                logger.info(f"Actualizando datos de CEPLAN para subproducto {existing_subproducto.codigo_subproducto} y año {anio}.")
-                for key, value in ceplan_fields.items():
-                    setattr(existing_ceplan, key, value)
-                session.add(existing_ceplan)
-            else:
-                logger.info(f"Creando nuevos datos de CEPLAN para subproducto {existing_subproducto.codigo_subproducto} y año {anio}.")
-                new_ceplan = ProgramacionCEPLAN(
-                    id_subproducto=existing_subproducto.id_subproducto,
-                    anio=anio,
-                    **ceplan_fields
+                normalized_code = _norm(codigo_ceplan)
+
+                # Find the match in the trie (exact hit or longest-prefix fallback).
+                match = _match_subproducto(subproducto_map, normalized_code)
+
+                if not match:
+                    skipped_count += 1
+                    logger.warning("Subproducto de CEPLAN con código '%s' (normalizado: '%s') no encontrado en la base de datos. Se omitirá.", codigo_ceplan, normalized_code)
+                    continue
+
+                sub_id, sub_codigo = match
+                # Formato diferido y nivel DEBUG: a N filas el f-string por
+                # fila era trabajo medible incluso con INFO filtrado
+                logger.debug("Match found: CEPLAN code '%s' matches DB code '%s'.", codigo_ceplan, sub_codigo)
+
+                anio = subproducto_data.get('anio', default_anio)
+                existing_ceplan = existing_map.get((sub_id, anio))
+
+                programado_data = subproducto_data.get('programado', {})
+                ejecutado_data = subproducto_data.get('ejecutado', {})
+
+                pending.append((sub_id, sub_codigo, anio, existing_ceplan))
+                raw_values.append(
+                    [programado_data.get(m, 0) for m in MONTHS]
+                    + [ejecutado_data.get(m, 0) for m in MONTHS]
                 )
-                session.add(new_ceplan)
-            
-            processed_count += 1
-        
+
+            # 4. Convertir todos los valores mensuales de una vez: to_numeric
+            # coerciona None/NaN/texto inválido y reemplazamos inf/NaN por 0,
+            # igual que safe_convert_to_float pero en un solo bucle en C.
+            if pending:
+                values = (
+                    pd.DataFrame(raw_values)
+                    .apply(pd.to_numeric, errors='coerce')
+                    .replace([float('inf'), float('-inf')], 0.0)
+                    .fillna(0.0)
+                    .to_numpy(dtype=float)
+                )
+                for (sub_id, sub_codigo, anio, existing_ceplan), row_values in zip(pending, values):
+                    ceplan_fields = dict(zip(CEPLAN_MONTH_FIELDS, row_values.tolist()))
+                    if existing_ceplan:
+                        # Re-importar el mismo extracto es común: si la fila ya
+                        # tiene exactamente estos valores, no emitir el UPDATE
+                        if all(getattr(existing_ceplan, field) == value
+                               for field, value in ceplan_fields.items()):
+                            processed_count += 1
+                            continue
+                        logger.debug("Actualizando datos de CEPLAN para subproducto %s y año %s.", sub_codigo, anio)
+                        rows_to_update.append({
+                            "id_prog_ceplan": existing_ceplan.id_prog_ceplan,
+                            **ceplan_fields
+                        })
+                    else:
+                        logger.debug("Creando nuevos datos de CEPLAN para subproducto %s y año %s.", sub_codigo, anio)
+                        insert_by_key[(sub_id, anio)] = {
+                            "id_subproducto": sub_id,
+                            "anio": anio,
+                            **ceplan_fields
+                        }
+                    processed_count += 1
+
+            # Bulk Core-level writes: one executemany per precompiled statement
+            # instead of N ORM flushes. Los extractos muy grandes se trocean
+            # para que el INSERT multi-fila reescrito por pymysql no exceda
+            # max_allowed_packet del servidor.
+            rows_to_insert = list(insert_by_key.values())
+            for start in range(0, len(rows_to_insert), _INSERT_BATCH_SIZE):
+                session.execute(_CEPLAN_INSERT_STMT, rows_to_insert[start:start + _INSERT_BATCH_SIZE])
+            if rows_to_update:
+                session.execute(_CEPLAN_UPDATE_STMT, rows_to_update)
+
         session.commit()
         
-        logger.info(f"CEPLAN data successfully stored to database! Processed {processed_count} subproducts.")
+        logger.info(
+            "CEPLAN data successfully stored to database! Processed %d subproducts (%d inserted, %d updated, %d skipped).",
+            processed_count, len(rows_to_insert), len(rows_to_update), skipped_count
+        )
         
         return {
             "processed_count": processed_count,
@@ -995,36 +1081,29 @@ async def get_ceplan_preview(
         logger.info(f"User {current_user.nombre} ({current_user.email}) requesting CEPLAN preview for ID: {preview_id}")
         
         # Verify the preview_id is a valid UUID format
-        import uuid
-        try:
-            uuid.UUID(preview_id)
-        except ValueError:
+        if not _UUID_RE.match(preview_id):
             logger.warning(f"Invalid preview ID format: {preview_id} by user {current_user.email}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="ID de vista previa inválido"
             )
         
-        # Path to the temporary JSON file
-        temp_file_path = Path(f"temp/uploads/{preview_id}.json")
-        
-        if not temp_file_path.exists():
-            logger.warning(f"CEPLAN preview file not found for ID: {preview_id} by user {current_user.email}")
+        # Leer el blob tal cual del almacén y empalmarlo en el sobre que
+        # esperan los clientes: evita decodificar y re-serializar todo el
+        # JSON en cada consulta de la vista previa
+        raw_preview = preview_store.load_preview(preview_id)
+        if raw_preview is None:
+            logger.warning(f"CEPLAN preview not found for ID: {preview_id} by user {current_user.email}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Vista previa CEPLAN no encontrada"
             )
-        
-        # Read and return the preview data
-        with open(temp_file_path, 'r', encoding='utf-8') as f:
-            preview_data = json.load(f)
-        
+
         logger.info(f"Successfully retrieved CEPLAN preview for ID: {preview_id} by user {current_user.email}")
-        return {
-            "preview_id": preview_id,
-            "data": preview_data,
-            "message": "Vista previa CEPLAN obtenida exitosamente"
-        }
+        envelope = b'{"preview_id": "%s", "data": %s, "message": "Vista previa CEPLAN obtenida exitosamente"}' % (
+            preview_id.encode('ascii'), raw_preview
+        )
+        return Response(content=envelope, media_type="application/json")
         
     except HTTPException:
         raise
@@ -1039,6 +1118,7 @@ async def get_ceplan_preview(
 @router.post("/commit-ceplan/{preview_id}")
 async def commit_ceplan_extract(
     preview_id: str,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(require_responsable_planificacion),
     session: Session = Depends(get_session)
 ):
@@ -1049,35 +1129,29 @@ async def commit_ceplan_extract(
         logger.info(f"User {current_user.nombre} ({current_user.email}) attempting to commit CEPLAN preview ID: {preview_id}")
         
         # Verify the preview_id is a valid UUID format
-        import uuid
-        try:
-            uuid.UUID(preview_id)
-        except ValueError:
+        if not _UUID_RE.match(preview_id):
             logger.warning(f"Invalid commit ID format: {preview_id} by user {current_user.email}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="ID de vista previa inválido"
             )
         
-        # Path to the temporary JSON file
-        temp_file_path = Path(f"temp/uploads/{preview_id}.json")
-        
-        if not temp_file_path.exists():
-            logger.warning(f"Commit file not found for ID: {preview_id} by user {current_user.email}")
+        # Read the preview payload from the store (orjson decodes far faster
+        # than stdlib json)
+        raw_preview = preview_store.load_preview(preview_id)
+        if raw_preview is None:
+            logger.warning(f"Commit preview not found for ID: {preview_id} by user {current_user.email}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Vista previa CEPLAN no encontrada"
             )
-        
-        # Read the preview data
-        with open(temp_file_path, 'r', encoding='utf-8') as f:
-            preview_data = json.load(f)
-        
+        preview_data = orjson.loads(raw_preview)
+
         # Process and store the CEPLAN data in the database
-        ceplan_result = await store_ceplan_data(preview_data, session, current_user)
+        ceplan_result = await run_in_threadpool(store_ceplan_data, preview_data, session, current_user)
         
-        # Remove the temporary file after successful commit
-        temp_file_path.unlink()
+        # Remove the preview after the response is sent
+        background_tasks.add_task(preview_store.delete_preview, preview_id)
         
         logger.info(f"Successfully committed CEPLAN data from preview ID: {preview_id} by user {current_user.email}")
         return {
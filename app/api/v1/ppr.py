@@ -1,31 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlmodel import Session, select
-from typing import List, Optional
-import pandas as pd
-import os
-from pathlib import Path
-from datetime import datetime
+from sqlalchemy.orm import selectinload
+from typing import Optional
+from operator import attrgetter
+from time import monotonic
+
+from sqlalchemy import event
 
 from app.core.security import get_current_active_user
-from app.core.rbac import require_responsable_ppr, require_responsable_planificacion
+from app.core.rbac import require_responsable_ppr
 from app.models.user import User
 from app.models.ppr import PPR, PPRBase, Producto, Actividad, Subproducto
 from app.models.programacion import ProgramacionPPR, ProgramacionCEPLAN
-from app.models.cartera_servicios import CarteraServicios
-from app.core.database import get_session
+from app.models.constants import MONTHS
+from app.core.database import get_session, SessionManager
+from app.core.orjson_response import ORJSONResponse
 from app.core.logging_config import get_logger
-from app.services.ppr_service import delete_ppr_data_by_year
+from app.services.ppr_service import (
+    delete_ppr_data_by_year,
+    sync_ppr_with_ceplan_data,
+    synchronize_ppr_with_cartera,
+)
 
 logger = get_logger(__name__)
 
+# Los attrgetter extraen los 12 valores mensuales en una sola llamada en C
+_PROG_GET = attrgetter(*(f'prog_{m}' for m in MONTHS))
+_EJEC_GET = attrgetter(*(f'ejec_{m}' for m in MONTHS))
+
+
+def _months_dict(getter, obj) -> dict:
+    """Dict mes -> valor mensual (None convertido a 0)"""
+    return dict(zip(MONTHS, (v or 0 for v in getter(obj))))
+
+
+# Serialización de PPR a dict sin pasar por model_dump(): un attrgetter
+# cacheado extrae los campos en una llamada en C y orjson codifica los
+# datetime/enum directamente, sin la validación de pydantic por fila
+_PPR_KEYS = ('id_ppr', 'codigo_ppr', 'nombre_ppr', 'anio', 'estado',
+             'fecha_creacion', 'fecha_actualizacion')
+_PPR_FIELDS = attrgetter(*_PPR_KEYS)
+
+
+def _ppr_to_dict(ppr: PPR) -> dict:
+    return dict(zip(_PPR_KEYS, _PPR_FIELDS(ppr)))
+
 
 router = APIRouter()
 
+# Los handlers de este módulo son "def" (no "async def") a propósito: toda
+# la E/S de base de datos es síncrona (pymysql), y declararlos async
+# bloquearía el event loop de Uvicorn en cada consulta. Starlette ejecuta
+# los handlers "def" en su threadpool, de modo que el loop puede atender
+# otras peticiones mientras se espera a la base de datos.
+
+# Caché de respuestas de get_ppr_estructura: el árbol PPR cambia poco pero
+# cada llamada rearma cientos de dicts anidados. Se guarda la estructura ya
+# construida por id_ppr con un TTL corto y se invalida ante cualquier
+# mutación ORM de los modelos involucrados (mismo patrón que el caché del
+# trie de subproductos en files.py).
+_ESTRUCTURA_CACHE_TTL_SECONDS = 300
+_estructura_cache: dict = {}
+
+
+def _invalidate_estructura_cache(*_args) -> None:
+    _estructura_cache.clear()
+
+
+_ESTRUCTURA_MODELS = (PPR, Producto, Actividad, Subproducto, ProgramacionPPR, ProgramacionCEPLAN)
+
+for _model in _ESTRUCTURA_MODELS:
+    for _event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event_name, _invalidate_estructura_cache)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_estructura_cache_on_bulk(execute_state) -> None:
+    # Los eventos de mapper de arriba no se disparan para los INSERT/UPDATE
+    # masivos estilo session.execute(insert(Modelo), filas) (p.ej. la
+    # escritura de CEPLAN en files.py); este hook de sesión cubre esa vía.
+    if execute_state.is_insert or execute_state.is_update or execute_state.is_delete:
+        mapper = execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in _ESTRUCTURA_MODELS:
+            _invalidate_estructura_cache()
+
 # --- Endpoints de Sincronización (Poner antes de los que usan {id}) ---
 
-@router.post("/sync-with-ceplan", response_class=JSONResponse)
-async def sync_with_ceplan(
+@router.post("/sync-with-ceplan", response_class=ORJSONResponse)
+def sync_with_ceplan(
     anio: int,
     sync_metas: bool = True,
     sync_avances: bool = False,
@@ -36,16 +98,16 @@ async def sync_with_ceplan(
     Sincronizar las metas o avances desde CEPLAN hacia PPR para un año específico.
     """
     try:
-        logger.info(f"User {current_user.nombre} initiating synchronization CEPLAN -> PPR for year {anio}. Metas: {sync_metas}, Avances: {sync_avances}")
-        from app.services.ppr_service import sync_ppr_with_ceplan_data
+        logger.debug("User %s initiating synchronization CEPLAN -> PPR for year %s. Metas: %s, Avances: %s",
+                     current_user.nombre, anio, sync_metas, sync_avances)
         result = sync_ppr_with_ceplan_data(year=anio, session=session, sync_metas=sync_metas, sync_avances=sync_avances)
         return {"data": result, "message": result["message"]}
     except Exception as e:
         logger.error(f"Error in CEPLAN sync: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error al sincronizar con CEPLAN: {str(e)}")
 
-@router.post("/create-from-cartera", response_class=JSONResponse)
-async def create_ppr_from_cartera(
+@router.post("/create-from-cartera", response_class=ORJSONResponse)
+def create_ppr_from_cartera(
     anio: int,
     current_user: User = Depends(require_responsable_ppr),
     session: Session = Depends(get_session)
@@ -54,7 +116,6 @@ async def create_ppr_from_cartera(
     Crear o actualizar estructura PPR desde Cartera.
     """
     try:
-        from app.services.ppr_service import synchronize_ppr_with_cartera
         result = synchronize_ppr_with_cartera(year=anio, session=session)
         return {"data": result, "message": result["message"]}
     except Exception as e:
@@ -63,46 +124,72 @@ async def create_ppr_from_cartera(
 
 # --- Endpoints de CRUD ---
 
-@router.get("/", response_class=JSONResponse)
-async def get_pprs(
+@router.get("/", response_class=ORJSONResponse)
+def get_pprs(
     anio: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[int] = None,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
 ):
-    """Obtener lista de PPRs filtrada por año"""
+    """
+    Obtener lista de PPRs filtrada por año, paginada por keyset.
+
+    Se pagina con un cursor sobre id_ppr descendente en lugar de
+    materializar toda la tabla; el cliente pide la página siguiente
+    pasando el next_cursor devuelto (None cuando no hay más páginas).
+    """
     try:
+        # Sesión de alcance acotado: la conexión vuelve al pool al salir del
+        # with, antes de serializar la respuesta
         statement = select(PPR)
         if anio: statement = statement.where(PPR.anio == anio)
-        pprs = session.exec(statement).all()
-        return {"data": [p.model_dump() for p in pprs], "message": "PPRs obtenidos exitosamente"}
+        if cursor: statement = statement.where(PPR.id_ppr < cursor)
+        statement = statement.order_by(PPR.id_ppr.desc()).limit(limit)
+        with SessionManager() as session:
+            pprs = session.exec(statement).all()
+        next_cursor = pprs[-1].id_ppr if len(pprs) == limit else None
+        return {
+            "data": [_ppr_to_dict(p) for p in pprs],
+            "next_cursor": next_cursor,
+            "message": "PPRs obtenidos exitosamente"
+        }
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{ppr_id}", response_class=JSONResponse)
-async def get_ppr(
+@router.get("/{ppr_id}", response_class=ORJSONResponse)
+def get_ppr(
     ppr_id: int,
     current_user: User = Depends(get_current_active_user),
-    session: Session = Depends(get_session)
 ):
-    ppr = session.get(PPR, ppr_id)
+    with SessionManager() as session:
+        ppr = session.get(PPR, ppr_id)
     if not ppr: raise HTTPException(status_code=404, detail="PPR no encontrado")
-    return {"data": ppr.model_dump(), "message": "PPR obtenido"}
+    return {"data": _ppr_to_dict(ppr), "message": "PPR obtenido"}
 
-@router.post("/", response_class=JSONResponse)
-async def create_ppr(
+@router.post("/", response_class=ORJSONResponse)
+def create_ppr(
     ppr_data: PPRBase,
     current_user: User = Depends(require_responsable_ppr),
     session: Session = Depends(get_session)
 ):
+    # Chequeo de duplicado con proyección escalar: no hidrata la fila y el
+    # índice (codigo_ppr, anio) resuelve el LIMIT 1 sin recorrer la tabla
+    duplicate = session.exec(
+        select(PPR.id_ppr)
+        .where(PPR.codigo_ppr == ppr_data.codigo_ppr, PPR.anio == ppr_data.anio)
+        .limit(1)
+    ).first()
+    if duplicate:
+        raise HTTPException(status_code=409, detail=f"Ya existe un PPR con código {ppr_data.codigo_ppr} para el año {ppr_data.anio}")
     new_ppr = PPR(**ppr_data.model_dump())
     session.add(new_ppr)
     session.commit()
     session.refresh(new_ppr)
-    return {"data": new_ppr.model_dump(), "message": "Creado"}
+    return {"data": _ppr_to_dict(new_ppr), "message": "Creado"}
 
-@router.delete("/{ppr_id}", response_class=JSONResponse)
-async def delete_ppr(
+@router.delete("/{ppr_id}", status_code=204, response_class=Response)
+def delete_ppr(
     ppr_id: int,
     current_user: User = Depends(require_responsable_ppr),
     session: Session = Depends(get_session)
@@ -111,10 +198,11 @@ async def delete_ppr(
     if not ppr: raise HTTPException(status_code=404, detail="No encontrado")
     session.delete(ppr)
     session.commit()
-    return {"message": "Eliminado"}
+    # El éxito lo transmite el código HTTP; sin cuerpo no hay serialización
+    return Response(status_code=204)
 
-@router.delete("/by-year/{year}", response_class=JSONResponse)
-async def delete_ppr_by_year(
+@router.delete("/by-year/{year}", response_class=ORJSONResponse)
+def delete_ppr_by_year(
     year: int,
     current_user: User = Depends(require_responsable_ppr),
     session: Session = Depends(get_session)
@@ -122,31 +210,77 @@ async def delete_ppr_by_year(
     deleted_count = delete_ppr_data_by_year(year=year, session=session)
     return {"message": f"Eliminados {deleted_count} registros"}
 
-@router.get("/{ppr_id}/estructura", response_class=JSONResponse)
-async def get_ppr_estructura(
+@router.get("/{ppr_id}/estructura", response_class=ORJSONResponse)
+def get_ppr_estructura(
     ppr_id: int,
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session)
 ):
     """Obtener estructura filtrada por CEPLAN"""
     try:
-        ppr = session.get(PPR, ppr_id)
+        cached = _estructura_cache.get(ppr_id)
+        if cached and monotonic() - cached[0] < _ESTRUCTURA_CACHE_TTL_SECONDS:
+            return {"data": cached[1], "message": "Estructura obtenida"}
+
+        # Cargar todo el árbol en consultas IN por nivel (4 consultas en
+        # total) en lugar de una consulta por producto y por actividad
+        ppr = session.exec(
+            select(PPR)
+            .options(
+                selectinload(PPR.productos)
+                .selectinload(Producto.actividades)
+                .selectinload(Actividad.subproductos)
+            )
+            .where(PPR.id_ppr == ppr_id)
+        ).first()
         if not ppr: raise HTTPException(status_code=404, detail="No encontrado")
         
         ppr_structure = {"ppr": {"codigo": ppr.codigo_ppr, "nombre": ppr.nombre_ppr, "anio": ppr.anio}, "productos": []}
-        productos = session.exec(select(Producto).where(Producto.id_ppr == ppr_id)).all()
         
-        for producto in productos:
+        # Dos consultas IN para todas las programaciones del árbol, en lugar
+        # de dos consultas por subproducto dentro del bucle
+        sub_ids = [
+            s.id_subproducto
+            for producto in ppr.productos
+            for actividad in producto.actividades
+            for s in actividad.subproductos
+        ]
+        prog_ceplan_by_id = {}
+        prog_ppr_by_id = {}
+        if sub_ids:
+            prog_ceplan_by_id = {
+                c.id_subproducto: c
+                for c in session.exec(
+                    select(ProgramacionCEPLAN)
+                    .where(ProgramacionCEPLAN.id_subproducto.in_(sub_ids),
+                           ProgramacionCEPLAN.anio == ppr.anio)
+                ).all()
+            }
+            prog_ppr_by_id = {
+                p.id_subproducto: p
+                for p in session.exec(
+                    select(ProgramacionPPR)
+                    .where(ProgramacionPPR.id_subproducto.in_(sub_ids),
+                           ProgramacionPPR.anio == ppr.anio)
+                ).all()
+            }
+        
+        for producto in ppr.productos:
             producto_structure = {"codigo_producto": producto.codigo_producto, "nombre_producto": producto.nombre_producto, "actividades": []}
-            actividades = session.exec(select(Actividad).where(Actividad.id_producto == producto.id_producto)).all()
             
-            for actividad in actividades:
+            for actividad in producto.actividades:
                 actividad_structure = {"codigo_actividad": actividad.codigo_actividad, "nombre_actividad": actividad.nombre_actividad, "subproductos": []}
-                subproductos = session.exec(select(Subproducto).where(Subproducto.id_actividad == actividad.id_actividad)).all()
                 
-                for subproducto in subproductos:
-                    cp = session.exec(select(ProgramacionCEPLAN).where(ProgramacionCEPLAN.id_subproducto == subproducto.id_subproducto, ProgramacionCEPLAN.anio == ppr.anio)).first()
-                    meta_c = sum([getattr(cp, f'prog_{m}', 0) or 0 for m in ['ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic']]) if cp else 0
+                for subproducto in actividad.subproductos:
+                    cp = prog_ceplan_by_id.get(subproducto.id_subproducto)
+                    # Suma directa de atributos: evita 12 getattr con f-string
+                    # y la lista intermedia por subproducto
+                    meta_c = (
+                        (cp.prog_ene or 0) + (cp.prog_feb or 0) + (cp.prog_mar or 0)
+                        + (cp.prog_abr or 0) + (cp.prog_may or 0) + (cp.prog_jun or 0)
+                        + (cp.prog_jul or 0) + (cp.prog_ago or 0) + (cp.prog_sep or 0)
+                        + (cp.prog_oct or 0) + (cp.prog_nov or 0) + (cp.prog_dic or 0)
+                    ) if cp else 0
                     
                     if meta_c <= 0: continue # FILTRO CEPLAN
                     
@@ -156,31 +290,32 @@ async def get_ppr_estructura(
                         "programacion_ppr": None,
                         "programacion_ceplan": {
                             "meta_anual": meta_c,
-                            "programado": {m: getattr(cp, f'prog_{m}', 0) or 0 for m in ['ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic']},
-                            "ejecutado": {m: getattr(cp, f'ejec_{m}', 0) or 0 for m in ['ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic']}
+                            "programado": _months_dict(_PROG_GET, cp),
+                            "ejecutado": _months_dict(_EJEC_GET, cp)
                         } if cp else None
                     }
                     
-                    pp = session.exec(select(ProgramacionPPR).where(ProgramacionPPR.id_subproducto == subproducto.id_subproducto, ProgramacionPPR.anio == ppr.anio)).first()
+                    pp = prog_ppr_by_id.get(subproducto.id_subproducto)
                     if pp:
                         sub_struct["programacion_ppr"] = {
                             "meta_anual": pp.meta_anual or 0,
-                            "programado": {m: getattr(pp, f'prog_{m}', 0) or 0 for m in ['ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic']},
-                            "ejecutado": {m: getattr(pp, f'ejec_{m}', 0) or 0 for m in ['ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic']}
+                            "programado": _months_dict(_PROG_GET, pp),
+                            "ejecutado": _months_dict(_EJEC_GET, pp)
                         }
                     actividad_structure["subproductos"].append(sub_struct)
                 
                 if actividad_structure["subproductos"]: producto_structure["actividades"].append(actividad_structure)
             
             if producto_structure["actividades"]: ppr_structure["productos"].append(producto_structure)
-            
+
+        _estructura_cache[ppr_id] = (monotonic(), ppr_structure)
         return {"data": ppr_structure, "message": "Estructura obtenida"}
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/data/ceplan-all")
-async def get_all_ceplan_data(
+def get_all_ceplan_data(
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session)
 ):
@@ -8,8 +8,11 @@ from app.schemas.ppr import SubproductProgrammingUpdate
 
 router = APIRouter()
 
+# Handlers "def" (no "async def") a propósito: la E/S de base de datos es
+# síncrona (pymysql) y en un handler async bloquearía el event loop; como
+# "def", Starlette los ejecuta en su threadpool.
 @router.put("/subproducto/{subproducto_id}")
-async def update_subproduct_programming_endpoint(
+def update_subproduct_programming_endpoint(
     subproducto_id: int,
     data: SubproductProgrammingUpdate,
     session: Session = Depends(get_session),
@@ -1,49 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import Session, select
+from sqlalchemy.orm import raiseload
 from typing import List, Optional
 from pydantic import BaseModel
 
 from app.core.security import get_current_active_user, get_password_hash
+from app.core.rbac import is_admin_role
 from app.core.database import get_session
-from app.models.user import User, InternalRoleEnum, get_role_display_name
+from app.models.user import User, InternalRoleEnum, get_role_display_name, get_role_internal_name
 from app.schemas.user import UserResponse, UserUpdate, UserCreate, RoleEnum
 from app.core.logging_config import get_logger
+from app.core.orjson_response import ORJSONResponse
 
 logger = get_logger(__name__)
 
 
 router = APIRouter()
 
+# Mapa rol interno -> RoleEnum de respuesta, resuelto una sola vez al importar
+# en lugar de llamar get_role_display_name + RoleEnum(...) por cada fila
+_ROLE_DISPLAY_CACHE = {r: RoleEnum(get_role_display_name(r)) for r in InternalRoleEnum}
 
-def is_admin_role(role_value) -> bool:
+
+def query_users_for_api():
     """
-    Check if the role value corresponds to an admin role
-    Handles both new enum values and old display names
+    Select de usuarios para las respuestas de la API.
+
+    raiseload('*') convierte cualquier carga perezosa accidental de una
+    relación (p. ej. pprs_asignados, un N+1 silencioso) en un error
+    inmediato; si una respuesta llega a necesitar una relación, añadirla
+    aquí con selectinload explícito.
     """
-    # Convert to string to handle both enum and string values
-    role_str = str(role_value).lower()
-    
-    admin_values = {
-        'admin', 
-        'administrador', 
-        'adminstrador',  # typo that might exist in db
-        'administrator'
-    }
-    
-    # Check if it's any of the admin values (case-insensitive)
-    if role_str in admin_values:
-        return True
-    # Check if it's the enum value
-    try:
-        if role_value == InternalRoleEnum.admin:
-            return True
-        # Additional check: see if the enum value matches when converted to string
-        if role_str == str(InternalRoleEnum.admin).lower():
-            return True
-    except:
-        pass  # In case role_value isn't an enum, continue with string check
-    
-    return False
+    return select(User).options(raiseload('*'))
+
+
+def _user_to_response(user: User) -> UserResponse:
+    """Convertir un User al formato de respuesta con el rol amigable"""
+    rol = _ROLE_DISPLAY_CACHE.get(user.rol) or RoleEnum(get_role_display_name(user.rol))
+    return UserResponse(
+        id_usuario=user.id_usuario,
+        nombre=user.nombre,
+        email=user.email,
+        rol=rol,
+        is_active=user.is_active,
+        fecha_creacion=user.fecha_creacion,
+        fecha_actualizacion=user.fecha_actualizacion
+    )
+
+
+# Email del administrador principal, protegido contra borrado. Su id se
+# resuelve una sola vez y se compara como entero antes de tocar la fila.
+PROTECTED_ADMIN_EMAIL = "admin@monitorppr.com"
+_protected_admin_id: Optional[int] = None
+
+
+def get_protected_admin_id(session: Session) -> Optional[int]:
+    global _protected_admin_id
+    if _protected_admin_id is None:
+        _protected_admin_id = session.exec(
+            select(User.id_usuario).where(User.email == PROTECTED_ADMIN_EMAIL)
+        ).first()
+    return _protected_admin_id
 
 
 def check_admin(user: User) -> None:
@@ -59,40 +76,35 @@ def check_admin(user: User) -> None:
     logger.info(f"Admin access granted for user {user.nombre} ({user.email})")
 
 
-@router.get("/", response_model=List[UserResponse])
-async def get_users(
+# Handlers "def" (no "async def") a propósito: la E/S de base de datos es
+# síncrona (pymysql) y en un handler async bloquearía el event loop; como
+# "def", Starlette los ejecuta en su threadpool.
+@router.get("/", response_model=List[UserResponse], response_class=ORJSONResponse)
+def get_users(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session)
 ):
     """
-    Obtener lista de usuarios (solo para administradores)
+    Obtener lista de usuarios paginada (solo para administradores)
     """
     logger.info(f"User {current_user.nombre} ({current_user.email}) requesting user list")
     check_admin(current_user)
     
-    users = session.exec(select(User)).all()
-    
-    # Convert users to response format, handling role enum conversion
-    user_responses = []
-    
-    for user in users:
-        user_response = UserResponse(
-            id_usuario=user.id_usuario,
-            nombre=user.nombre,
-            email=user.email,
-            rol=RoleEnum(get_role_display_name(user.rol)),  # Convert to display role enum
-            is_active=user.is_active,
-            fecha_creacion=user.fecha_creacion,
-            fecha_actualizacion=user.fecha_actualizacion
-        )
-        user_responses.append(user_response)
+    # Paginar en el servidor en lugar de materializar toda la tabla
+    users = session.exec(
+        query_users_for_api().order_by(User.id_usuario).offset(offset).limit(limit)
+    ).all()
+
+    user_responses = [_user_to_response(user) for user in users]
     
     logger.info(f"Successfully retrieved {len(user_responses)} users for admin {current_user.email}")
     return user_responses
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(
+def get_user(
     user_id: int,
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session)
@@ -111,26 +123,14 @@ async def get_user(
             detail="Usuario no encontrado"
         )
     
-    # Convert user to response format, handling role enum conversion
-    from app.models.user import get_role_display_name
-    from app.schemas.user import RoleEnum
-    
-    user_response = UserResponse(
-        id_usuario=user.id_usuario,
-        nombre=user.nombre,
-        email=user.email,
-        rol=RoleEnum(get_role_display_name(user.rol)),  # Convert to display role enum
-        is_active=user.is_active,
-        fecha_creacion=user.fecha_creacion,
-        fecha_actualizacion=user.fecha_actualizacion
-    )
+    user_response = _user_to_response(user)
     
     logger.info(f"Successfully retrieved user {user.email} for admin {current_user.email}")
     return user_response
 
 
 @router.post("/", response_model=UserResponse)
-async def create_user(
+def create_user(
     user_data: UserCreate,
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session)
@@ -141,12 +141,12 @@ async def create_user(
     logger.info(f"Admin {current_user.nombre} ({current_user.email}) attempting to create new user with email {user_data.email}")
     check_admin(current_user)
     
-    # Verificar si el email ya existe
-    existing_user = session.exec(
-        select(User).where(User.email == user_data.email)
+    # Verificar si el email ya existe (proyeccion escalar: sin hidratar filas)
+    email_taken = session.exec(
+        select(User.id_usuario).where(User.email == user_data.email).limit(1)
     ).first()
     
-    if existing_user:
+    if email_taken:
         logger.warning(f"Attempt to create duplicate user with email {user_data.email} by admin {current_user.email}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -155,7 +155,6 @@ async def create_user(
     
     # Crear nuevo usuario
     # Convert display role enum back to internal role enum before storing in DB
-    from app.models.user import get_role_internal_name
     internal_role = get_role_internal_name(user_data.rol)
     
     hashed_password = get_password_hash(user_data.password)
@@ -170,23 +169,14 @@ async def create_user(
     session.commit()
     session.refresh(new_user)
     
-    # Convert user to response format, handling role enum conversion
-    user_response = UserResponse(
-        id_usuario=new_user.id_usuario,
-        nombre=new_user.nombre,
-        email=new_user.email,
-        rol=RoleEnum(get_role_display_name(new_user.rol)),  # Convert to display role enum
-        is_active=new_user.is_active,
-        fecha_creacion=new_user.fecha_creacion,
-        fecha_actualizacion=new_user.fecha_actualizacion
-    )
+    user_response = _user_to_response(new_user)
     
     logger.info(f"Successfully created user {new_user.email} by admin {current_user.email}")
     return user_response
 
 
 @router.put("/{user_id}", response_model=UserResponse)
-async def update_user(
+def update_user(
     user_id: int,
     user_data: UserUpdate,
     current_user: User = Depends(get_current_active_user),
@@ -211,7 +201,6 @@ async def update_user(
     for field, value in update_data.items():
         if field == "rol":
             # Convert display role enum back to internal role enum before storing in DB
-            from app.models.user import get_role_internal_name
             internal_role = get_role_internal_name(value)
             setattr(user, field, internal_role)
         else:
@@ -219,25 +208,15 @@ async def update_user(
     
     session.add(user)
     session.commit()
-    session.refresh(user)
     
-    # Convert user to response format, handling role enum conversion
-    user_response = UserResponse(
-        id_usuario=user.id_usuario,
-        nombre=user.nombre,
-        email=user.email,
-        rol=RoleEnum(get_role_display_name(user.rol)),  # Convert to display role enum
-        is_active=user.is_active,
-        fecha_creacion=user.fecha_creacion,
-        fecha_actualizacion=user.fecha_actualizacion
-    )
+    user_response = _user_to_response(user)
     
     logger.info(f"Successfully updated user {user.email} by admin {current_user.email}")
     return user_response
 
 
 @router.delete("/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
     current_user: User = Depends(get_current_active_user),
     session: Session = Depends(get_session)
@@ -248,6 +227,15 @@ async def delete_user(
     logger.info(f"Admin {current_user.nombre} ({current_user.email}) attempting to delete user with ID {user_id}")
     check_admin(current_user)
     
+    # No eliminar el usuario administrador principal: comparación por id
+    # cacheado, sin necesidad de traer la fila
+    if user_id == get_protected_admin_id(session):
+        logger.warning(f"Attempt to delete main admin user by admin {current_user.email}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No se puede eliminar el usuario administrador principal"
+        )
+    
     user = session.get(User, user_id)
     if not user:
         logger.warning(f"Attempt to delete non-existent user {user_id} by admin {current_user.email}")
@@ -256,14 +244,6 @@ async def delete_user(
             detail="Usuario no encontrado"
         )
     
-    # No eliminar el usuario administrador principal
-    if user.rol == InternalRoleEnum.admin and user.email == "admin@monitorppr.com":
-        logger.warning(f"Attempt to delete main admin user by admin {current_user.email}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No se puede eliminar el usuario administrador principal"
-        )
-    
     session.delete(user)
     session.commit()
     
@@ -277,7 +257,7 @@ class PasswordUpdate(BaseModel):
 
 
 @router.put("/{user_id}/password")
-async def update_user_password(
+def update_user_password(
     user_id: int,
     password_data: PasswordUpdate,
     current_user: User = Depends(get_current_active_user),
@@ -329,7 +309,7 @@ async def update_user_password(
 
 
 @router.get("/current-role", response_model=dict)
-async def get_current_user_role(
+def get_current_user_role(
     current_user: User = Depends(get_current_active_user)
 ):
     """
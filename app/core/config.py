@@ -1,4 +1,5 @@
-from typing import Optional
+from typing import List, Optional
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 import os
@@ -12,16 +13,49 @@ class Settings(BaseSettings):
     # Configuración de base de datos - MariaDB para desarrollo
     database_url: str = "mariadb+pymysql://root:@localhost:3306/monitor_ppr"  # Configuración para MariaDB
     db_echo: bool = False  # Cambiar a True para ver consultas SQL en consola
+    # Pool de conexiones (ajustables por .env según el despliegue; con varios
+    # workers de uvicorn considerar un proxy tipo PgBouncer/MaxScale delante)
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 3600
+    db_pool_pre_ping: bool = True
+    # Producción con varios workers: apuntar database_url a un proxy de
+    # conexiones (ProxySQL/MaxScale en modo transacción) y activar este flag
+    # para encoger el pool local; el proxy multiplexa las conexiones reales
+    # y se encarga de la validación, así que pre_ping sobra.
+    use_external_pooler: bool = False
     
     # Configuración de autenticación
     secret_key: str = "dev_secret_key_change_in_production"  # Cambiar en producción
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    bcrypt_rounds: int = 12  # Costo del hash de contraseñas (ajustable por entorno)
     
+    # Orígenes permitidos para CORS (lista JSON en .env). El frontend se
+    # sirve desde esta misma aplicación, así que por defecto solo se admiten
+    # los orígenes locales de desarrollo; listar aquí el dominio real al
+    # desplegar.
+    cors_origins: List[str] = [
+        "http://localhost:8000",
+        "http://127.0.0.1:8000",
+    ]
+
     # Configuración de entorno
     debug: bool = True
     
-    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, extra="ignore")
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, extra="ignore", frozen=True)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Instancia única de Settings (parsear .env una sola vez por proceso).
+
+    Inyectable con Depends(get_settings) y reemplazable en pruebas vía
+    app.dependency_overrides[get_settings].
+    """
+    return Settings()
 
 
-settings = Settings()
+settings = get_settings()
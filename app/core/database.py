@@ -5,9 +5,61 @@ import os
 # Configurar la URL de la base de datos
 DATABASE_URL = settings.database_url
 
-# Crear el engine de la base de datos
-engine = create_engine(DATABASE_URL, echo=settings.db_echo)
+# Con un proxy de conexiones delante (ProxySQL/MaxScale en modo transacción)
+# cada worker solo necesita un pool pequeño: el proxy multiplexa las
+# conexiones reales hacia MariaDB y valida/recicla por su cuenta.
+if settings.use_external_pooler:
+    _pool_size = 2
+    _max_overflow = 4
+    _pool_pre_ping = False
+else:
+    _pool_size = settings.db_pool_size
+    _max_overflow = settings.db_max_overflow
+    _pool_pre_ping = settings.db_pool_pre_ping
+
+# Crear el engine de la base de datos.
+# Pool dimensionado para el threadpool de Starlette (el default de 5
+# conexiones hace cola bajo concurrencia); pre_ping y recycle evitan
+# errores por conexiones muertas tras reinicios o timeouts de MariaDB.
+engine = create_engine(
+    DATABASE_URL,
+    echo=settings.db_echo,
+    pool_size=_pool_size,
+    max_overflow=_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=_pool_pre_ping,
+    pool_recycle=settings.db_pool_recycle,
+    # LIFO: reutilizar la conexión más reciente (cachés del servidor
+    # calientes) y dejar que las sobrantes caduquen por recycle
+    pool_use_lifo=True,
+    # Caché LRU de sentencias compiladas: el default (500) se desborda con
+    # las consultas IN de tamaño variable y fuerza recompilaciones
+    query_cache_size=1200,
+    # Lotes de 1000 filas por sentencia en los INSERT masivos
+    insertmanyvalues_page_size=1000,
+)
 
 def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+    # expire_on_commit=False: los objetos siguen siendo legibles tras el
+    # commit sin disparar un SELECT de recarga por atributo accedido
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+
+class SessionManager:
+    """
+    Sesión de alcance acotado para uso inline: ``with SessionManager() as session``.
+
+    A diferencia de Depends(get_session), que retiene la conexión hasta que
+    la respuesta termina de enviarse, aquí la conexión vuelve al pool al
+    salir del bloque with, antes de la serialización de la respuesta. Usar
+    en endpoints calientes donde el trabajo de base de datos es una fracción
+    del tiempo total de la petición.
+    """
+
+    def __enter__(self) -> Session:
+        self._session = Session(engine, expire_on_commit=False)
+        return self._session
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._session.close()
\ No newline at end of file
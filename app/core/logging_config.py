@@ -1,17 +1,70 @@
+import atexit
 import logging
 import logging.config
+import queue
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 from pathlib import Path
 import os
-from datetime import datetime
 
-# Create logs directory if it doesn't exist
+# Ninguno de los formatters usa %(thread)s/%(process)s/%(processName)s:
+# desactivar su recolección evita llamadas a threading/os.getpid por cada
+# LogRecord creado
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+# Create log directories if they don't exist
 logs_dir = Path("logs")
-logs_dir.mkdir(exist_ok=True)
+for _subdir in ("errors", "info", "debug"):
+    (logs_dir / _subdir).mkdir(parents=True, exist_ok=True)
+
+_DEFAULT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+_DETAILED_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s"
+
+# Escritura a disco fuera del hilo de la petición: los loggers encolan el
+# registro en _log_queue (operación en memoria) y un QueueListener en
+# segundo plano es quien posee los handlers de archivo y hace la E/S.
+# respect_handler_level conserva el enrutado por nivel de cada archivo.
+#
+# Rotación por medianoche en lugar de fecha horneada en el nombre: un
+# proceso de larga vida abre el archivo del día sin reiniciar. delay=True
+# pospone el open() hasta el primer registro (p.ej. error.log si no hay
+# errores).
+class _LevelRange(logging.Filter):
+    """
+    Acepta solo registros con low <= levelno < high.
+
+    Sin este filtro cada registro INFO se escribía en info y debug, y los
+    ERROR en los tres archivos: amplificación de escrituras pura. Con los
+    rangos, cada registro hace exactamente un write().
+    """
+
+    def __init__(self, low: int, high: int):
+        super().__init__()
+        self.low = low
+        self.high = high
+
+    def filter(self, record) -> bool:
+        return self.low <= record.levelno < self.high
+
+
+def _file_handler(filename: str, low: int, high: int, fmt: str) -> TimedRotatingFileHandler:
+    handler = TimedRotatingFileHandler(
+        filename, when="midnight", backupCount=14, encoding="utf-8", delay=True
+    )
+    handler.setLevel(low)
+    handler.addFilter(_LevelRange(low, high))
+    handler.setFormatter(logging.Formatter(fmt))
+    return handler
+
+
+_log_queue: "queue.Queue" = queue.Queue(maxsize=10000)
+_listener = None
+
+
+def _queue_handler_factory() -> QueueHandler:
+    return QueueHandler(_log_queue)
 
-# Create specific directories for different log types
-(Path(logs_dir) / "errors").mkdir(exist_ok=True)
-(Path(logs_dir) / "info").mkdir(exist_ok=True)
-(Path(logs_dir) / "debug").mkdir(exist_ok=True)
 
 # Logging configuration dictionary
 LOGGING_CONFIG = {
@@ -19,10 +72,10 @@ LOGGING_CONFIG = {
     "disable_existing_loggers": False,
     "formatters": {
         "default": {
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+            "format": _DEFAULT_FORMAT,
         },
         "detailed": {
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s",
+            "format": _DETAILED_FORMAT,
         },
     },
     "handlers": {
@@ -32,61 +85,67 @@ LOGGING_CONFIG = {
             "formatter": "default",
             "stream": "ext://sys.stdout",
         },
-        "error_file": {
-            "class": "logging.handlers.RotatingFileHandler",
-            "level": "ERROR",
-            "formatter": "detailed",
-            "filename": f"logs/errors/error_{datetime.now().strftime('%Y%m%d')}.log",
-            "maxBytes": 10485760,  # 10MB
-            "backupCount": 5,
-        },
-        "info_file": {
-            "class": "logging.handlers.RotatingFileHandler",
-            "level": "INFO",
-            "formatter": "default",
-            "filename": f"logs/info/info_{datetime.now().strftime('%Y%m%d')}.log",
-            "maxBytes": 10485760,  # 10MB
-            "backupCount": 5,
-        },
-        "debug_file": {
-            "class": "logging.handlers.RotatingFileHandler",
+        # Handler no bloqueante hacia los archivos rotatorios (ver arriba)
+        "queue": {
+            "()": _queue_handler_factory,
             "level": "DEBUG",
-            "formatter": "detailed",
-            "filename": f"logs/debug/debug_{datetime.now().strftime('%Y%m%d')}.log",
-            "maxBytes": 10485760,  # 10MB
-            "backupCount": 5,
         },
     },
     "loggers": {
         "app": {
             "level": "DEBUG",
-            "handlers": ["console", "error_file", "info_file", "debug_file"],
+            "handlers": ["console", "queue"],
             "propagate": False,
         },
         "uvicorn": {
             "level": "INFO",
-            "handlers": ["console", "info_file"],
+            "handlers": ["console", "queue"],
             "propagate": False,
         },
         "uvicorn.error": {
             "level": "ERROR",
-            "handlers": ["console", "error_file"],
+            "handlers": ["console", "queue"],
             "propagate": False,
         },
         "fastapi": {
             "level": "INFO",
-            "handlers": ["console", "info_file"],
+            "handlers": ["console", "queue"],
             "propagate": False,
         },
     },
     "root": {
         "level": "INFO",
-        "handlers": ["console", "error_file", "info_file"],
+        "handlers": ["console", "queue"],
     },
 }
 
+def configure_logging() -> None:
+    """
+    Aplica la configuración de logging una sola vez por proceso.
+
+    El guard sobre el módulo logging (compartido aunque este módulo se
+    reimporte o recargue) evita arrancar un segundo QueueListener y
+    duplicar handlers, que multiplicaría las escrituras por registro.
+    """
+    global _listener
+    if getattr(logging, "_ppr_logging_configured", False):
+        return
+    _listener = QueueListener(
+        _log_queue,
+        _file_handler("logs/errors/error.log", logging.ERROR, logging.CRITICAL + 1, _DETAILED_FORMAT),
+        _file_handler("logs/info/info.log", logging.INFO, logging.ERROR, _DEFAULT_FORMAT),
+        _file_handler("logs/debug/debug.log", logging.DEBUG, logging.INFO, _DETAILED_FORMAT),
+        respect_handler_level=True,
+    )
+    _listener.start()
+    # Vaciar lo encolado al apagar el proceso
+    atexit.register(_listener.stop)
+    logging.config.dictConfig(LOGGING_CONFIG)
+    logging._ppr_logging_configured = True
+
+
 # Apply the logging configuration
-logging.config.dictConfig(LOGGING_CONFIG)
+configure_logging()
 
 # Create loggers
 app_logger = logging.getLogger("app")
@@ -96,4 +155,4 @@ fastapi_logger = logging.getLogger("fastapi")
 
 def get_logger(name: str = "app") -> logging.Logger:
     """Get a configured logger instance"""
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
@@ -0,0 +1,26 @@
+"""
+Clase de respuesta JSON serializada con orjson.
+
+FastAPI serializa los dicts devueltos con jsonable_encoder + json.dumps de la
+librería estándar; para los endpoints con payloads grandes (estructura PPR,
+detalle) la serialización domina la latencia. orjson serializa en código
+nativo y codifica datetime/numpy directamente, sin pasadas previas de
+conversión a str.
+"""
+import orjson
+from fastapi import Response
+
+
+class ORJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        # default=str cubre tipos no soportados (Decimal, UUID, etc.).
+        # Sin OPT_NAIVE_UTC: los timestamps de los modelos son hora local
+        # naive (datetime.now()) y etiquetarlos como UTC desplazaría la hora
+        # mostrada por los clientes; orjson ya los emite sin offset.
+        return orjson.dumps(
+            content,
+            default=str,
+            option=orjson.OPT_SERIALIZE_NUMPY,
+        )
@@ -0,0 +1,91 @@
+"""
+Almacén de vistas previas respaldado por SQLite.
+
+Las vistas previas de carga (PPR y CEPLAN) vivían como archivos JSON sueltos
+en temp/uploads: el upload serializaba con sangría, el preview releía y
+re-parseaba, y el commit volvía a parsear antes de borrar. Este módulo guarda
+el payload una sola vez como blob binario (orjson, compacto) en una base
+SQLite local, de modo que los endpoints lean exactamente los bytes escritos y
+varios workers de uvicorn puedan compartir las vistas previas.
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Base dedicada: las vistas previas son efímeras y no pertenecen al esquema
+# principal de MariaDB
+_DB_PATH = Path("temp/previews.db")
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Conexión perezosa y única por proceso (protegida por _lock)"""
+    global _conn
+    if _conn is None:
+        _DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(_DB_PATH), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS previews ("
+            "preview_id TEXT PRIMARY KEY, "
+            "payload BLOB NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def save_preview(preview_id: str, payload) -> bytes:
+    """
+    Serializa el payload con orjson (NaN/Inf se emiten como null, igual que
+    hacía simplejson con ignore_nan) y lo guarda bajo preview_id.
+    Devuelve los bytes serializados para que el llamador pueda reutilizarlos
+    en la respuesta sin re-serializar.
+    """
+    raw = orjson.dumps(payload)
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO previews (preview_id, payload, created_at) VALUES (?, ?, ?)",
+            (preview_id, raw, time.time()),
+        )
+        conn.commit()
+    return raw
+
+
+def load_preview(preview_id: str) -> Optional[bytes]:
+    """Devuelve los bytes del payload, o None si la vista previa no existe"""
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT payload FROM previews WHERE preview_id = ?", (preview_id,)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def delete_preview(preview_id: str) -> None:
+    """Elimina la vista previa (sin error si ya no existe)"""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("DELETE FROM previews WHERE preview_id = ?", (preview_id,))
+        conn.commit()
+
+
+def purge_expired(max_age_seconds: float) -> int:
+    """Borra las vistas previas abandonadas; devuelve cuántas se eliminaron"""
+    cutoff = time.time() - max_age_seconds
+    with _lock:
+        conn = _get_conn()
+        cursor = conn.execute("DELETE FROM previews WHERE created_at < ?", (cutoff,))
+        conn.commit()
+    return cursor.rowcount
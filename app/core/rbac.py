@@ -1,64 +1,105 @@
 from fastapi import Depends, HTTPException, status
-from typing import Callable, List
+from functools import lru_cache
+from typing import Callable, Iterable, List
 from enum import Enum
 
 from app.models.user import User, InternalRoleEnum as RoleEnum
 from app.core.security import get_current_active_user
 
 
+@lru_cache(maxsize=None)
+def _role_checker_for(roles: frozenset) -> Callable:
+    """
+    Construye (y memoiza) el verificador de roles para un conjunto dado.
+
+    Conjuntos idénticos de roles devuelven el mismo callable, de modo que
+    FastAPI puede reutilizar su caché de dependencias y no se crea un
+    closure nuevo por cada registro de ruta. El frozenset hace la
+    comprobación de pertenencia en O(1).
+    """
+    async def role_checker(current_user: User = Depends(get_current_active_user)) -> User:
+        if current_user.rol not in roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="No tiene permisos suficientes para acceder a este recurso"
+            )
+        return current_user
+    return role_checker
+
+
 class RoleAccess:
     """
     Clase para manejar control de acceso basado en roles
     """
-    
+
     @staticmethod
-    def require_roles(roles: List[RoleEnum]) -> Callable:
+    def require_roles(roles: Iterable[RoleEnum]) -> Callable:
         """
         Decorador para requerir roles específicos
         """
-        async def role_checker(current_user: User = Depends(get_current_active_user)) -> User:
-            if current_user.rol not in roles:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="No tiene permisos suficientes para acceder a este recurso"
-                )
-            return current_user
-        return role_checker
+        return _role_checker_for(frozenset(roles))
 
     @staticmethod
     def admin_only():
         """
         Requiere rol de administrador
         """
-        return RoleAccess.require_roles([RoleEnum.admin])
+        return ADMIN_ONLY
 
     @staticmethod
     def responsable_ppr_only():
         """
         Requiere rol de Responsable PPR
         """
-        return RoleAccess.require_roles([RoleEnum.responsable_ppr])
+        return RESPONSABLE_PPR_ONLY
 
     @staticmethod
     def responsable_planificacion_only():
         """
         Requiere rol de Responsable Planificación
         """
-        return RoleAccess.require_roles([RoleEnum.responsable_planificacion])
+        return RESPONSABLE_PLANIFICACION_ONLY
 
     @staticmethod
     def ppr_responsable_or_admin():
         """
         Requiere rol de Responsable PPR o Administrador
         """
-        return RoleAccess.require_roles([RoleEnum.responsable_ppr, RoleEnum.admin])
+        return PPR_OR_ADMIN
 
     @staticmethod
     def planificacion_responsable_or_admin():
         """
         Requiere rol de Responsable Planificación o Administrador
         """
-        return RoleAccess.require_roles([RoleEnum.responsable_planificacion, RoleEnum.admin])
+        return PLANIFICACION_OR_ADMIN
+
+
+# Verificadores precomputados para los conjuntos de roles habituales
+ADMIN_ONLY = _role_checker_for(frozenset({RoleEnum.admin}))
+RESPONSABLE_PPR_ONLY = _role_checker_for(frozenset({RoleEnum.responsable_ppr}))
+RESPONSABLE_PLANIFICACION_ONLY = _role_checker_for(frozenset({RoleEnum.responsable_planificacion}))
+PPR_OR_ADMIN = _role_checker_for(frozenset({RoleEnum.responsable_ppr, RoleEnum.admin}))
+PLANIFICACION_OR_ADMIN = _role_checker_for(frozenset({RoleEnum.responsable_planificacion, RoleEnum.admin}))
+
+
+# Tokens de rol administrador normalizados una sola vez al importar (incluye
+# el typo 'adminstrador' que puede existir en datos antiguos)
+_ADMIN_TOKENS = frozenset({'admin', 'administrador', 'adminstrador', 'administrator'})
+
+
+def is_admin_role(role_value) -> bool:
+    """
+    Verifica si el valor de rol corresponde a un administrador.
+    Acepta el enum interno y los nombres antiguos guardados como string.
+    """
+    return role_value is RoleEnum.admin or str(role_value).lower() in _ADMIN_TOKENS
+
+
+# Conjuntos de roles de las funciones de acceso directo: el "in" sobre un
+# frozenset es una sola búsqueda hash, sin construir una lista por llamada
+_PPR_OR_ADMIN_ROLES = frozenset({RoleEnum.responsable_ppr, RoleEnum.admin})
+_PLANIFICACION_OR_ADMIN_ROLES = frozenset({RoleEnum.responsable_planificacion, RoleEnum.admin})
 
 
 # Funciones de acceso directo
@@ -66,7 +107,8 @@ def require_admin(current_user: User = Depends(get_current_active_user)) -> User
     """
     Requiere rol de administrador
     """
-    if current_user.rol != RoleEnum.admin:
+    # Los miembros de un Enum son singletons: comparación por identidad
+    if current_user.rol is not RoleEnum.admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Se requiere rol de administrador"
@@ -78,7 +120,7 @@ def require_responsable_ppr(current_user: User = Depends(get_current_active_user
     """
     Requiere rol de Responsable PPR
     """
-    if current_user.rol not in [RoleEnum.responsable_ppr, RoleEnum.admin]:
+    if current_user.rol not in _PPR_OR_ADMIN_ROLES:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Se requiere rol de Responsable PPR o Administrador"
@@ -90,7 +132,7 @@ def require_responsable_planificacion(current_user: User = Depends(get_current_a
     """
     Requiere rol de Responsable Planificación
     """
-    if current_user.rol not in [RoleEnum.responsable_planificacion, RoleEnum.admin]:
+    if current_user.rol not in _PLANIFICACION_OR_ADMIN_ROLES:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Se requiere rol de Responsable Planificación o Administrador"
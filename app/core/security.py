@@ -1,7 +1,7 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy import bindparam, event as sa_event, select
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session
@@ -9,35 +9,23 @@ from .config import settings
 from ..models.user import User
 from ..core.database import get_session
 import bcrypt
+import hashlib
 
-# Contexto de hashing de contraseñas con configuración específica para evitar problemas de compatibilidad
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def get_password_hash_direct(password: str) -> str:
+def _bcrypt_input(password: str) -> bytes:
     """
-    Genera el hash de una contraseña usando bcrypt directamente para evitar problemas de compatibilidad
+    Preprocesa una contraseña para bcrypt.
+
+    Bcrypt tiene un límite de 72 bytes: las contraseñas más largas se
+    reducen primero con SHA-256, manteniendo la seguridad sin limitar la
+    longitud de la contraseña original. Hash y verificación comparten este
+    preprocesamiento para ser consistentes.
     """
-    import hashlib
-    
-    # Bcrypt tiene un límite de 72 caracteres para la contraseña
-    # Para evitar este problema, usamos SHA-256 para preprocesar la contraseña
-    # Esto mantiene la seguridad sin limitar la longitud de la contraseña original
+    password_bytes = password.encode('utf-8')
     if len(password) > 72:
-        # Si la contraseña es muy larga, creamos un hash SHA-256 de la contraseña
-        # y usamos ese hash como la entrada para bcrypt
-        password_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
-    else:
-        password_hash = password
-    
-    # Codificar la contraseña (o su hash) a bytes
-    password_bytes = password_hash.encode('utf-8')
-    
-    # Generar el hash
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    
-    # Decodificar a string para almacenamiento
-    return hashed.decode('utf-8')
+        password_bytes = hashlib.sha256(password_bytes).hexdigest().encode('utf-8')
+    return password_bytes
+
 
 # Esquema OAuth2 para obtener token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.api_v1_prefix}/auth/login")
@@ -46,45 +34,19 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verifica que la contraseña plana coincida con la contraseña hasheada
     """
-    import hashlib
-    import bcrypt
-    
-    # Aplicar el mismo preprocesamiento que en get_password_hash
-    # para mantener la consistencia en la verificación
-    if len(plain_password) > 72:
-        # Aplicar el mismo proceso que en get_password_hash
-        plain_password_hash = hashlib.sha256(plain_password.encode('utf-8')).hexdigest()
-    else:
-        plain_password_hash = plain_password
-    
-    # Usar bcrypt directamente para evitar problemas de compatibilidad con passlib
-    password_bytes = plain_password_hash.encode('utf-8')
-    hashed_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
+    return bcrypt.checkpw(_bcrypt_input(plain_password), hashed_password.encode('utf-8'))
 
 
 def get_password_hash(password: str) -> str:
     """
-    Genera el hash de una contraseña
+    Genera el hash de una contraseña usando bcrypt directamente
     """
-    import hashlib
-    
-    # Bcrypt tiene un límite de 72 caracteres para la contraseña
-    # Para evitar este problema, usamos SHA-256 para preprocesar la contraseña
-    # Esto mantiene la seguridad sin limitar la longitud de la contraseña original
-    if len(password) > 72:
-        # Si la contraseña es muy larga, creamos un hash SHA-256 de la contraseña
-        # y usamos ese hash como la entrada para bcrypt
-        password_hash = hashlib.sha256(password.encode('utf-8')).hexdigest()
-    else:
-        password_hash = password
-    
-    # Usar bcrypt directamente para evitar problemas de compatibilidad con passlib
-    password_bytes = password_hash.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    
-    return hashed.decode('utf-8')
+    salt = bcrypt.gensalt(rounds=settings.bcrypt_rounds)
+    return bcrypt.hashpw(_bcrypt_input(password), salt).decode('utf-8')
+
+
+# Alias histórico: la ruta "directa" es ahora la única implementación
+get_password_hash_direct = get_password_hash
 
 
 def authenticate_user(user: User, password: str) -> bool:
@@ -96,21 +58,50 @@ def authenticate_user(user: User, password: str) -> bool:
     return True
 
 
+# Expiración por defecto precomputada (datetime.utcnow está deprecado y
+# construir el timedelta en cada emisión es trabajo repetido)
+_DEFAULT_TOKEN_EXPIRY = timedelta(minutes=settings.access_token_expire_minutes)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
     Crea un token JWT de acceso
     """
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    
-    to_encode.update({"exp": expire})
+    expire = datetime.now(timezone.utc) + (expires_delta or _DEFAULT_TOKEN_EXPIRY)
+    # exp como entero epoch: forma canónica de RFC 7519 y más barata de codificar
+    to_encode.update({"exp": int(expire.timestamp())})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
 
+# Cachés de autenticación por proceso: cada petición protegida pagaba una
+# verificación HMAC del token y un SELECT por clave primaria solo para
+# resolver la identidad. El caché de tokens guarda (user_id, exp) hasta que
+# el token expira (la firma no cambia); el de usuarios guarda la fila con un
+# TTL corto y se invalida ante cualquier mutación ORM de User (mismo patrón
+# que el caché de estructura en ppr.py).
+_TOKEN_CACHE_MAX_ENTRIES = 2048
+_token_cache: dict = {}  # token -> (user_id, exp_ts)
+
+_USER_CACHE_TTL_SECONDS = 30
+_user_cache: dict = {}  # user_id -> (cached_at, User)
+
+
+def _invalidate_user_cache(*_args) -> None:
+    _user_cache.clear()
+
+
+for _event_name in ("after_insert", "after_update", "after_delete"):
+    sa_event.listen(User, _event_name, _invalidate_user_cache)
+
+
+# Sentencia de búsqueda por id construida una sola vez: cada llamada reusa
+# el mismo árbol Core (y su SQL compilado en el caché del engine) en lugar
+# de rearmar el SELECT desde los metadatos del mapper
+_USER_BY_ID_STMT = select(User).where(User.id_usuario == bindparam("uid"))
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
     """
     Obtiene el usuario actual a partir del token JWT
@@ -120,17 +111,31 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: Session
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+    now = datetime.now().timestamp()
+    cached = _token_cache.get(token)
+    if cached and cached[1] > now:
+        user_id = cached[0]
+    else:
+        try:
+            payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+            user_id = payload.get("sub")
+            if user_id is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = session.get(User, int(user_id))
+        user_id = int(user_id)
+        if len(_token_cache) >= _TOKEN_CACHE_MAX_ENTRIES:
+            _token_cache.clear()
+        _token_cache[token] = (user_id, payload.get("exp") or now)
+
+    cached_user = _user_cache.get(user_id)
+    if cached_user and now - cached_user[0] < _USER_CACHE_TTL_SECONDS:
+        return cached_user[1]
+
+    user = session.execute(_USER_BY_ID_STMT, {"uid": user_id}).scalar_one_or_none()
     if user is None:
         raise credentials_exception
+    _user_cache[user_id] = (now, user)
     return user
 
 
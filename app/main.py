@@ -1,13 +1,109 @@
-import logging
-from fastapi import FastAPI
+import asyncio
+import time
+from email.utils import formatdate
+from hashlib import md5
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from pathlib import Path
 from app.core.config import settings
+from app.core import preview_store
+from app.core.orjson_response import ORJSONResponse
 from app.api.v1.api import api_router
-from app.core.logging_config import get_logger, app_logger
+from app.core.logging_config import app_logger
+
+
+# Tiempo de vida máximo de las vistas previas y frecuencia de limpieza.
+# PREVIEWS_DIR cubre las vistas previas de cartera, que siguen spooleándose
+# como archivos JSON (las de PPR/CEPLAN viven en el preview_store SQLite).
+PREVIEWS_DIR = Path("temp/uploads")
+PREVIEW_MAX_AGE_SECONDS = 3600 * 24  # 24 horas
+PREVIEW_SWEEP_INTERVAL_SECONDS = 3600  # Revisar cada hora
+
+_STATIC_DIR = Path(__file__).parent / "static"
+
+# Páginas HTML servidas por la aplicación: ruta -> (archivo, etiqueta de log)
+PAGES = {
+    "/": ("index.html", "Home"),
+    "/ppr": ("ppr.html", "PPR management"),
+    "/users": ("users.html", "Users management"),
+    "/reports": ("reports.html", "Reports"),
+    "/login": ("login.html", "Login"),
+    "/ppr_detalle": ("ppr_detalle.html", "PPR detailed view"),
+    "/preview": ("preview.html", "Preview"),
+    "/transversal_data": ("transversal_data.html", "Transversal data"),
+    "/dashboard_admin": ("dashboard_admin.html", "Admin dashboard"),
+    "/dashboard_responsable_ppr": ("dashboard_responsable_ppr.html", "PPR Responsible dashboard"),
+    "/dashboard_responsable_planificacion": ("dashboard_responsable_planificacion.html", "Planning Responsible dashboard"),
+}
+
+# Los HTML son estáticos y pequeños: se leen una sola vez al arrancar y se
+# sirven los bytes ya decodificados, sin syscall ni decodificación UTF-8 por
+# petición. Cada entrada guarda (bytes, ETag, Last-Modified) para responder
+# 304 Not Modified a los GET condicionales del navegador sin reenviar el
+# cuerpo.
+_PAGE_CACHE: dict = {}
+
+
+def _cache_page(path: str) -> tuple:
+    file = _STATIC_DIR / PAGES[path][0]
+    content = file.read_bytes()
+    entry = _PAGE_CACHE[path] = (
+        content,
+        f'"{md5(content).hexdigest()}"',
+        formatdate(file.stat().st_mtime, usegmt=True),
+    )
+    return entry
+
+
+def _load_page_cache() -> None:
+    for path in PAGES:
+        _cache_page(path)
+
+
+def _page_response(request: Request, path: str) -> Response:
+    entry = _PAGE_CACHE.get(path)
+    if entry is None:
+        # Arranques sin evento startup (p.ej. clientes de prueba)
+        entry = _cache_page(path)
+    content, etag, last_modified = entry
+    headers = {"etag": etag, "last-modified": last_modified, "cache-control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="text/html", headers=headers)
+
+
+async def _sweep_previews():
+    """
+    Tarea en segundo plano que elimina vistas previas abandonadas.
+
+    Las vistas previas solo se borran al confirmar (commit); las abandonadas
+    se acumulan en el almacén y consumen disco. Esta tarea purga
+    periódicamente las entradas con antigüedad mayor a
+    PREVIEW_MAX_AGE_SECONDS.
+    """
+    while True:
+        try:
+            removed = preview_store.purge_expired(PREVIEW_MAX_AGE_SECONDS)
+            # Las vistas previas de cartera siguen siendo archivos JSON en
+            # temp/uploads que solo se borran al confirmar: barrer también
+            # por antigüedad los archivos abandonados
+            if PREVIEWS_DIR.exists():
+                now = time.time()
+                for preview_file in PREVIEWS_DIR.iterdir():
+                    try:
+                        if now - preview_file.stat().st_mtime > PREVIEW_MAX_AGE_SECONDS:
+                            preview_file.unlink(missing_ok=True)
+                            removed += 1
+                    except OSError:
+                        # El archivo pudo haber sido confirmado/eliminado en paralelo
+                        continue
+            if removed:
+                app_logger.info(f"Preview sweep removed {removed} expired preview(s)")
+        except Exception as e:
+            app_logger.error(f"Error sweeping expired previews: {str(e)}", exc_info=True)
+        await asyncio.sleep(PREVIEW_SWEEP_INTERVAL_SECONDS)
 
 
 def create_app() -> FastAPI:
@@ -21,176 +117,65 @@ def create_app() -> FastAPI:
         openapi_url=f"{settings.api_v1_prefix}/openapi.json",
         docs_url=f"{settings.api_v1_prefix}/docs",
         redoc_url=f"{settings.api_v1_prefix}/redoc",
+        # Serialización JSON con orjson (código C) para todas las rutas que
+        # no declaran response_class propia
+        default_response_class=ORJSONResponse,
     )
 
-    # Configurar CORS
+    # Configurar CORS: orígenes explícitos desde settings en lugar de "*",
+    # lo que habilita la rama de comparación exacta de Starlette y evita el
+    # reescrito del header Origin por respuesta; max_age deja que el
+    # navegador cachee el preflight un día entero
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=["*"],  # Cambiar en producción
+        allow_origins=settings.cors_origins,
         allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
+        allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH"],
+        allow_headers=["Authorization", "Content-Type"],
+        max_age=86400,
     )
 
     # Montar directorio de archivos estáticos
-    app.mount("/static", StaticFiles(directory=Path(__file__).parent / "static"), name="static")
+    app.mount("/static", StaticFiles(directory=_STATIC_DIR), name="static")
 
     # Incluir rutas de la API
     app.include_router(api_router, prefix=settings.api_v1_prefix)
 
-    # Ruta raíz que sirve el index.html
-    @app.get("/", response_class=HTMLResponse)
-    async def read_root():
-        try:
-            with open(Path(__file__).parent / "static" / "index.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("Home page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing home page: {str(e)}", exc_info=True)
-            raise
-
-    # Ruta para PPR management
-    @app.get("/ppr", response_class=HTMLResponse)
-    async def read_ppr():
-        try:
-            with open(Path(__file__).parent / "static" / "ppr.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("PPR management page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing PPR management page: {str(e)}", exc_info=True)
-            raise
-
-    # Ruta para usuarios
-    @app.get("/users", response_class=HTMLResponse)
-    async def read_users():
-        try:
-            with open(Path(__file__).parent / "static" / "users.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("Users management page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing users management page: {str(e)}", exc_info=True)
-            raise
-
-    # Ruta para reportes
-    @app.get("/reports", response_class=HTMLResponse)
-    async def read_reports():
-        try:
-            with open(Path(__file__).parent / "static" / "reports.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("Reports page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing reports page: {str(e)}", exc_info=True)
-            raise
-
-    # Ruta para login
-    @app.get("/login", response_class=HTMLResponse)
-    async def read_login():
-        try:
-            with open(Path(__file__).parent / "static" / "login.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("Login page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing login page: {str(e)}", exc_info=True)
-            raise
-
-    # Ruta para PPR detalle
-    @app.get("/ppr_detalle", response_class=HTMLResponse)
-    async def read_ppr_detalle():
-        try:
-            with open(Path(__file__).parent / "static" / "ppr_detalle.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("PPR detailed view page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing PPR detailed view page: {str(e)}", exc_info=True)
-            raise
-
-    # Ruta para previsualización de datos
-    @app.get("/preview", response_class=HTMLResponse)
-    async def read_preview():
-        try:
-            with open(Path(__file__).parent / "static" / "preview.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("Preview page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing preview page: {str(e)}", exc_info=True)
-            raise
-    
-    # Ruta para datos transversales
-    @app.get("/transversal_data", response_class=HTMLResponse)
-    async def read_transversal_data():
-        try:
-            with open(Path(__file__).parent / "static" / "transversal_data.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("Transversal data page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing transversal data page: {str(e)}", exc_info=True)
-            raise
-
-    # Ruta para dashboard del administrador
-    @app.get("/dashboard_admin", response_class=HTMLResponse)
-    async def read_dashboard_admin():
-        try:
-            with open(Path(__file__).parent / "static" / "dashboard_admin.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("Admin dashboard page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing admin dashboard page: {str(e)}", exc_info=True)
-            raise
-
-    # Ruta para dashboard del responsable PPR
-    @app.get("/dashboard_responsable_ppr", response_class=HTMLResponse)
-    async def read_dashboard_responsable_ppr():
-        try:
-            with open(Path(__file__).parent / "static" / "dashboard_responsable_ppr.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("PPR Responsible dashboard page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing PPR Responsible dashboard page: {str(e)}", exc_info=True)
-            raise
-
-    # Ruta para dashboard del responsable de planificación
-    @app.get("/dashboard_responsable_planificacion", response_class=HTMLResponse)
-    async def read_dashboard_responsable_planificacion():
-        try:
-            with open(Path(__file__).parent / "static" / "dashboard_responsable_planificacion.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("Planning Responsible dashboard page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing Planning Responsible dashboard page: {str(e)}", exc_info=True)
-            raise
-
-    # Ruta raíz redirige al dashboard según rol (si está autenticado)
-    @app.get("/", response_class=HTMLResponse)
-    async def read_root():
-        try:
-            # El comportamiento dependerá de si el usuario está autenticado
-            # Si está autenticado, redirigimos al dashboard correspondiente
-            # Si no, mostramos la página de inicio
-            with open(Path(__file__).parent / "static" / "index.html", "r", encoding="utf-8") as file:
-                content = file.read()
-            app_logger.info("Home page accessed successfully")
-            return HTMLResponse(content=content)
-        except Exception as e:
-            app_logger.error(f"Error accessing home page: {str(e)}", exc_info=True)
-            raise
+    # Rutas de páginas HTML generadas desde la tabla PAGES: un solo handler
+    # parametrizado en lugar de once copias casi idénticas. Fuera del esquema
+    # OpenAPI (no son parte de la API y abultan /openapi.json).
+    def _make_page_handler(path: str, label: str):
+        async def page_handler(request: Request):
+            try:
+                app_logger.info("%s page accessed successfully", label)
+                return _page_response(request, path)
+            except Exception as e:
+                app_logger.error(f"Error accessing {label} page: {str(e)}", exc_info=True)
+                raise
+        return page_handler
+
+    for page_path, (_page_file, page_label) in PAGES.items():
+        app.add_api_route(
+            page_path,
+            _make_page_handler(page_path, page_label),
+            methods=["GET"],
+            response_class=HTMLResponse,
+            include_in_schema=False,
+        )
 
     @app.on_event("startup")
     async def startup_event():
+        # Precargar los HTML en memoria para servirlos sin tocar disco
+        _load_page_cache()
+        # Lanzar la tarea de limpieza de vistas previas expiradas
+        app.state.preview_sweeper = asyncio.create_task(_sweep_previews())
         app_logger.info("Application started successfully")
-        
+
     @app.on_event("shutdown")
     async def shutdown_event():
+        sweeper = getattr(app.state, "preview_sweeper", None)
+        if sweeper:
+            sweeper.cancel()
         app_logger.info("Application shutting down")
 
     return app
@@ -206,4 +191,4 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=settings.debug
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,13 @@
+"""
+Constantes compartidas de los modelos de programación mensual.
+"""
+
+# Meses abreviados tal como aparecen en las columnas prog_*/ejec_* de los
+# modelos ProgramacionPPR/ProgramacionCEPLAN
+MONTHS = ('ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic')
+
+# Columnas mensuales (programado y ejecutado) en el orden de los modelos
+MONTH_VALUE_FIELDS = tuple(f"{prefix}_{m}" for m in MONTHS for prefix in ("prog", "ejec"))
+
+# Plantilla de fila mensual en cero para inicializar programaciones
+ZERO_MONTHS = {field: 0.0 for field in MONTH_VALUE_FIELDS}
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 from enum import Enum
@@ -26,6 +27,9 @@ class PPR(PPRBase, table=True):
     Representa la entidad principal en la jerarquía PPR → producto → actividad → subproducto
     """
     __tablename__ = "pprs"
+    # Cubre el lookup por (codigo, anio) de la sincronización con cartera;
+    # unique porque no puede haber dos PPR con el mismo código en un año
+    __table_args__ = (Index('ix_ppr_codigo_anio', 'codigo_ppr', 'anio', unique=True),)
     
     id_ppr: Optional[int] = Field(default=None, primary_key=True)
     
@@ -49,6 +53,7 @@ class Producto(ProductoBase, table=True):
     Parte de la jerarquía PPR → producto → actividad → subproducto
     """
     __tablename__ = "productos"
+    __table_args__ = (Index('ix_producto_ppr_codigo', 'id_ppr', 'codigo_producto'),)
     
     id_producto: Optional[int] = Field(default=None, primary_key=True)
     id_ppr: int = Field(foreign_key="pprs.id_ppr", description="ID del PPR al que pertenece")
@@ -73,6 +78,7 @@ class Actividad(ActividadBase, table=True):
     Parte de la jerarquía PPR → producto → actividad → subproducto
     """
     __tablename__ = "actividades"
+    __table_args__ = (Index('ix_actividad_producto_codigo', 'id_producto', 'codigo_actividad'),)
     
     id_actividad: Optional[int] = Field(default=None, primary_key=True)
     id_producto: int = Field(foreign_key="productos.id_producto", description="ID del producto al que pertenece")
@@ -98,6 +104,7 @@ class Subproducto(SubproductoBase, table=True):
     Parte de la jerarquía PPR → producto → actividad → subproducto
     """
     __tablename__ = "subproductos"
+    __table_args__ = (Index('ix_subproducto_actividad_codigo', 'id_actividad', 'codigo_subproducto'),)
     
     id_subproducto: Optional[int] = Field(default=None, primary_key=True)
     id_actividad: int = Field(foreign_key="actividades.id_actividad", description="ID de la actividad a la que pertenece")
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -11,6 +12,9 @@ class ProgramacionPPR(SQLModel, table=True):
     Almacena metas anuales y programación mensual para subproductos PPR
     """
     __tablename__ = "programaciones_ppr"
+    # Cubre las consultas por subproducto y año de estructura/sincronización;
+    # unique: a lo sumo una programación PPR por subproducto y año
+    __table_args__ = (Index('ix_prog_ppr_subproducto_anio', 'id_subproducto', 'anio', unique=True),)
     
     id_prog_ppr: Optional[int] = Field(default=None, primary_key=True)
     id_subproducto: int = Field(foreign_key="subproductos.id_subproducto", description="ID del subproducto")
@@ -57,6 +61,8 @@ class ProgramacionCEPLAN(SQLModel, table=True):
     Almacena datos oficiales de CEPLAN para comparación con PPR
     """
     __tablename__ = "programaciones_ceplan"
+    # unique: a lo sumo una programación CEPLAN por subproducto y año
+    __table_args__ = (Index('ix_prog_ceplan_subproducto_anio', 'id_subproducto', 'anio', unique=True),)
     
     id_prog_ceplan: Optional[int] = Field(default=None, primary_key=True)
     id_subproducto: int = Field(foreign_key="subproductos.id_subproducto", description="ID del subproducto")
@@ -108,7 +114,9 @@ class Diferencia(SQLModel, table=True):
     Almacena diferencias calculadas entre PPR y CEPLAN
     """
     __tablename__ = "diferencias"
-    
+    # unique: a lo sumo una fila de diferencias por subproducto y año
+    __table_args__ = (Index('ix_diferencia_subproducto_anio', 'id_subproducto', 'anio', unique=True),)
+
     id_diferencia: Optional[int] = Field(default=None, primary_key=True)
     id_subproducto: int = Field(foreign_key="subproductos.id_subproducto", description="ID del subproducto")
     anio: int = Field(description="Año de la diferencia")
@@ -13,26 +13,30 @@ class InternalRoleEnum(str, Enum):
     responsable_ppr = "responsable_ppr"
     responsable_planificacion = "responsable_planificacion"
 
+# Tablas de conversión estáticas a nivel de módulo: construir los dicts en
+# cada llamada era trabajo repetido
+_ROLE_DISPLAY_MAP = {
+    InternalRoleEnum.admin: "Administrador",
+    InternalRoleEnum.responsable_ppr: "Responsable PPR",
+    InternalRoleEnum.responsable_planificacion: "Responsable Planificación"
+}
+
+_DISPLAY_TO_ROLE_MAP = {
+    "Administrador": InternalRoleEnum.admin,
+    "Responsable PPR": InternalRoleEnum.responsable_ppr,
+    "Responsable Planificación": InternalRoleEnum.responsable_planificacion,
+    "admin": InternalRoleEnum.admin,
+    "responsable_ppr": InternalRoleEnum.responsable_ppr,
+    "responsable_planificacion": InternalRoleEnum.responsable_planificacion
+}
+
 def get_role_display_name(internal_role):
     """Obtener el nombre amigable para mostrar de un rol interno"""
-    role_display_map = {
-        InternalRoleEnum.admin: "Administrador",
-        InternalRoleEnum.responsable_ppr: "Responsable PPR",
-        InternalRoleEnum.responsable_planificacion: "Responsable Planificación"
-    }
-    return role_display_map.get(internal_role, str(internal_role))
+    return _ROLE_DISPLAY_MAP.get(internal_role, str(internal_role))
 
 def get_role_internal_name(display_name):
     """Obtener el rol interno a partir del nombre amigable"""
-    display_to_role_map = {
-        "Administrador": InternalRoleEnum.admin,
-        "Responsable PPR": InternalRoleEnum.responsable_ppr,
-        "Responsable Planificación": InternalRoleEnum.responsable_planificacion,
-        "admin": InternalRoleEnum.admin,
-        "responsable_ppr": InternalRoleEnum.responsable_ppr,
-        "responsable_planificacion": InternalRoleEnum.responsable_planificacion
-    }
-    return display_to_role_map.get(display_name)
+    return _DISPLAY_TO_ROLE_MAP.get(display_name)
 
 
 class UserBase(SQLModel):
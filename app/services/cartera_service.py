@@ -1,11 +1,16 @@
 """
 Service for handling Cartera de Servicios data
 """
+import openpyxl
 import pandas as pd
 import re
+import unicodedata
+from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 import logging
+from sqlalchemy import insert, update
 from sqlmodel import Session, select
 
 from app.models.cartera_servicios import CarteraServicios
@@ -13,6 +18,20 @@ from app.services.extractor_service import PPRExtractorService
 
 logger = logging.getLogger(__name__)
 
+# Campos de la cartera en el orden de las columnas esperadas
+_CARTERA_FIELDS = ('programa', 'producto', 'actividad', 'sub_producto', 'trazador', 'unidad_medida')
+
+# Código seguido de nombre, p.ej. "0002 SALUD MATERNO NEONATAL"
+_CODE_NAME_RE = re.compile(r'^(\d+(?:\.\d+)?)\s+(.+)$')
+
+# Regexes de normalización de cabeceras, compiladas una sola vez. Las
+# versiones anteriores llevaban las barras duplicadas (r'[\\s...]'), con lo
+# que casaban caracteres literales en lugar de clases: ni el colapso de
+# puntuación ni el filtro de palabras comunes funcionaban de verdad.
+_PUNCT_RE = re.compile(r'[\s\-\_\.\,\:]+')
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9\s]')
+_STOPWORD_RE = re.compile(r'\b(el|la|de|del|al|a|e|i|o|u)\b')
+
 
 class CarteraService:
     """Service for handling Cartera de Servicios data from Excel files"""
@@ -38,11 +57,34 @@ class CarteraService:
         try:
             # Determine the appropriate engine based on file extension
             file_extension = file_path.suffix.lower()
-            
+
             if file_extension == '.xlsx':
-                # For .xlsx files, use openpyxl engine (which is already in dependencies)
-                df = pd.read_excel(file_path, header=None, engine='openpyxl')
-                logger.info(f"Loaded .xlsx Excel file with openpyxl engine. Shape: {df.shape}")
+                # Lectura en streaming con openpyxl read_only: no se
+                # materializa la hoja completa en un DataFrame; se inspeccionan
+                # las primeras filas para las cabeceras y luego se recorren
+                # las filas de datos proyectando solo las columnas de interés
+                workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+                try:
+                    worksheet = workbook.active
+                    head_rows = [list(row) for row in worksheet.iter_rows(min_row=1, max_row=10, values_only=True)]
+                    header_positions = self._find_cartera_header_positions(head_rows)
+                    if not header_positions:
+                        logger.error("Could not find expected headers in the file")
+                        raise ValueError("No valid headers found. Expected columns: Programa, Producto, Actividad, Sub Producto, Trazador, Unidad de Medida")
+                    # Una sola materialización: del generador directo a la
+                    # lista que viaja al JSON de vista previa
+                    cartera_data = list(self._iter_cartera_records(
+                        worksheet.iter_rows(min_row=header_positions['data_start_row'] + 1, values_only=True),
+                        header_positions,
+                    ))
+                finally:
+                    workbook.close()
+                result = {
+                    "cartera": cartera_data,
+                    "total_records": len(cartera_data)
+                }
+                logger.info(f"Cartera de Servicios extraction completed. Found {len(cartera_data)} records.")
+                return result
             elif file_extension == '.xls':
                 # For .xls files, try xlrd engine first
                 try:
@@ -67,7 +109,7 @@ class CarteraService:
             logger.info(f"Loaded Excel file with {len(df)} rows and {len(df.columns)} columns")
             
             # Find header row and column positions
-            header_positions = self._find_cartera_header_positions(df)
+            header_positions = self._find_cartera_header_positions(df.head(10).values.tolist())
             
             if not header_positions:
                 logger.error("Could not find expected headers in the file")
@@ -88,8 +130,13 @@ class CarteraService:
             logger.error(f"Error extracting Cartera de Servicios data from {file_path}: {str(e)}", exc_info=True)
             raise e
     
-    def _find_cartera_header_positions(self, df: pd.DataFrame) -> Dict[str, int]:
-        """Find positions of Cartera headers in the Excel file"""
+    def _find_cartera_header_positions(self, head_rows: List[List]) -> Dict[str, int]:
+        """
+        Find positions of Cartera headers in the first rows of the file.
+
+        Recibe las primeras filas como listas de celdas (vale tanto para el
+        streaming de openpyxl como para un DataFrame via .values.tolist()).
+        """
         logger.info("Searching for Cartera headers...")
         
         # Define comprehensive patterns for each column type
@@ -121,95 +168,120 @@ class CarteraService:
             ]
         }
         
-        for row_idx in range(min(10, len(df))):  # Check first 10 rows for headers
-            row = df.iloc[row_idx]
-            
+        # Normalizar todos los patrones una sola vez fuera del bucle,
+        # descartando los degenerados tras normalizar (p.ej. 'u.m.' -> 'm'):
+        # casarían con casi cualquier celda
+        norm_patterns = {
+            column_type: [np for np in (self._normalize_text(p) for p in patterns) if len(np) > 1]
+            for column_type, patterns in column_patterns.items()
+        }
+
+        header_positions: Dict[str, int] = {}
+        remaining = set(column_patterns)
+
+        for row_idx, row in enumerate(head_rows[:10]):  # Check first 10 rows for headers
             # Check each cell in the row
-            for col_idx in range(len(row)):
-                cell_value = row.iloc[col_idx]
-                if pd.notna(cell_value):
-                    cell_text = str(cell_value)
-                    normalized_cell_text = self._normalize_text(cell_text)
-                    
-                    # Check if this cell matches any column type
-                    for column_type, patterns in column_patterns.items():
-                        for pattern in patterns:
-                            # Use normalized text for comparison
-                            normalized_pattern = self._normalize_text(pattern)
-                            if normalized_pattern in normalized_cell_text:
-                                # If we haven't already found this header type, record it
-                                if column_type not in locals().get('header_positions', {}):
-                                    if 'header_positions' not in locals():
-                                        header_positions = {}
-                                    header_positions[column_type] = col_idx
-                                    logger.debug(f"Found {column_type} header at row {row_idx}, col {col_idx}: '{cell_text}' (matched: '{pattern}')")
-                                    break  # Move to the next column type once a match is found
-                        
+            for col_idx, cell_value in enumerate(row):
+                if not remaining:
+                    break
+                if cell_value is None or not pd.notna(cell_value):
+                    continue
+                normalized_cell_text = self._normalize_text(str(cell_value))
+                if not normalized_cell_text:
+                    continue
+                # Check if this cell matches any column type still unmatched,
+                # siempre en el orden fijo de _CARTERA_FIELDS: iterar el set
+                # haría nondeterminista qué tipo gana cuando una celda casa
+                # con varios (los patrones de 'producto' son subcadenas de
+                # 'sub producto')
+                for column_type in _CARTERA_FIELDS:
+                    if column_type not in remaining:
+                        continue
+                    if any(p in normalized_cell_text for p in norm_patterns[column_type]):
+                        header_positions[column_type] = col_idx
+                        remaining.discard(column_type)
+                        logger.debug(f"Found {column_type} header at row {row_idx}, col {col_idx}: '{cell_value}'")
+                        break  # La celda ya quedó asignada a un tipo de columna
+
             # Check if we found all required headers
-            required_headers = ['programa', 'producto', 'actividad', 'sub_producto', 'trazador', 'unidad_medida']
-            if 'header_positions' in locals() and all(header in header_positions for header in required_headers):
+            if not remaining:
                 header_positions['data_start_row'] = row_idx + 1
                 logger.info(f"All required headers found: {header_positions}")
                 return header_positions
-        
-        # If we didn't find all headers, log which ones are missing
-        if 'header_positions' in locals():
-            missing_headers = [h for h in required_headers if h not in header_positions]
-        else:
-            missing_headers = required_headers
-        
-        logger.warning(f"Could not find all required headers. Missing: {missing_headers}")
+
+        logger.warning(f"Could not find all required headers. Missing: {sorted(remaining)}")
         return {}
     
+    def _iter_cartera_records(self, rows, header_positions: Dict[str, int]) -> Iterator[Dict]:
+        """
+        Yield Cartera records from an iterable of row tuples (openpyxl streaming).
+
+        Generador: cada fila se procesa y se cede sin acumular una lista
+        intermedia; solo se tocan las seis posiciones de interés.
+        """
+        positions = [header_positions[f] for f in _CARTERA_FIELDS]
+
+        for row in rows:
+            row_len = len(row)
+            programa, producto, actividad, sub_producto, trazador, unidad_medida = (
+                str(row[i]) if i < row_len and row[i] is not None else ""
+                for i in positions
+            )
+
+            # Only add record if we have at least minimum required data
+            if programa or producto or actividad or sub_producto:
+                programa_codigo, programa_nombre = self._extract_code_name(programa)
+                producto_codigo, producto_nombre = self._extract_code_name(producto)
+                actividad_codigo, actividad_nombre = self._extract_code_name(actividad)
+                sub_producto_codigo, sub_producto_nombre = self._extract_code_name(sub_producto)
+
+                yield {
+                    "programa_codigo": programa_codigo,
+                    "programa_nombre": programa_nombre,
+                    "producto_codigo": producto_codigo,
+                    "producto_nombre": producto_nombre,
+                    "actividad_codigo": actividad_codigo,
+                    "actividad_nombre": actividad_nombre,
+                    "sub_producto_codigo": sub_producto_codigo,
+                    "sub_producto_nombre": sub_producto_nombre,
+                    "trazador": trazador.strip(),
+                    "unidad_medida": unidad_medida.strip()
+                }
+
     def _extract_cartera_data(self, df: pd.DataFrame, header_positions: Dict[str, int]) -> List[Dict]:
         """Extract Cartera data from the Excel file using header positions"""
         logger.info("Extracting Cartera data...")
-        
-        cartera_records = []
-        
+
         data_start_row = header_positions.get('data_start_row', 0)
-        
-        for row_idx in range(data_start_row, len(df)):
-            row = df.iloc[row_idx]
-            
-            if row.isnull().all():
-                continue  # Skip empty rows
-            
-            # Extract values using header positions
-            try:
-                programa = str(row.iloc[header_positions['programa']]) if header_positions['programa'] < len(row) and pd.notna(row.iloc[header_positions['programa']]) else ""
-                producto = str(row.iloc[header_positions['producto']]) if header_positions['producto'] < len(row) and pd.notna(row.iloc[header_positions['producto']]) else ""
-                actividad = str(row.iloc[header_positions['actividad']]) if header_positions['actividad'] < len(row) and pd.notna(row.iloc[header_positions['actividad']]) else ""
-                sub_producto = str(row.iloc[header_positions['sub_producto']]) if header_positions['sub_producto'] < len(row) and pd.notna(row.iloc[header_positions['sub_producto']]) else ""
-                trazador = str(row.iloc[header_positions['trazador']]) if header_positions['trazador'] < len(row) and pd.notna(row.iloc[header_positions['trazador']]) else ""
-                unidad_medida = str(row.iloc[header_positions['unidad_medida']]) if header_positions['unidad_medida'] < len(row) and pd.notna(row.iloc[header_positions['unidad_medida']]) else ""
-                
-                # Only add record if we have at least minimum required data
-                if programa or producto or actividad or sub_producto:
-                    # Extract code and name from each field
-                    programa_codigo, programa_nombre = self._extract_code_name(programa)
-                    producto_codigo, producto_nombre = self._extract_code_name(producto)
-                    actividad_codigo, actividad_nombre = self._extract_code_name(actividad)
-                    sub_producto_codigo, sub_producto_nombre = self._extract_code_name(sub_producto)
-                    
-                    record = {
-                        "programa_codigo": programa_codigo,
-                        "programa_nombre": programa_nombre,
-                        "producto_codigo": producto_codigo,
-                        "producto_nombre": producto_nombre,
-                        "actividad_codigo": actividad_codigo,
-                        "actividad_nombre": actividad_nombre,
-                        "sub_producto_codigo": sub_producto_codigo,
-                        "sub_producto_nombre": sub_producto_nombre,
-                        "trazador": trazador.strip(),
-                        "unidad_medida": unidad_medida.strip()
-                    }
-                    cartera_records.append(record)
-                    
-            except IndexError:
-                logger.warning(f"Row {row_idx} doesn't have enough columns, skipping...")
-                continue
-        
+
+        # Proyectar de una vez las seis columnas de interés: las operaciones
+        # siguientes son vectorizadas por columna en lugar de un df.iloc
+        # escalar por celda
+        data = df.iloc[data_start_row:, [header_positions[f] for f in _CARTERA_FIELDS]]
+        if data.empty:
+            return []
+        data = data.copy()
+        data.columns = _CARTERA_FIELDS
+        data = data.dropna(how="all")  # Skip empty rows
+        # NaN -> "" y el resto a str, como hacía str(cell) por celda
+        data = data.where(data.notna(), "").astype(str)
+
+        # Only keep rows with at least minimum required data
+        data = data[(data[["programa", "producto", "actividad", "sub_producto"]] != "").any(axis=1)]
+
+        # Separar código y nombre de cada campo jerárquico en una pasada
+        # str.extract por columna; sin match el código queda vacío y el
+        # texto completo pasa como nombre (misma regla que _extract_code_name)
+        out = pd.DataFrame(index=data.index)
+        for field in ("programa", "producto", "actividad", "sub_producto"):
+            stripped = data[field].str.strip()
+            extracted = stripped.str.extract(_CODE_NAME_RE)
+            out[f"{field}_codigo"] = extracted[0].fillna("")
+            out[f"{field}_nombre"] = extracted[1].str.strip().where(extracted[0].notna(), stripped)
+        out["trazador"] = data["trazador"].str.strip()
+        out["unidad_medida"] = data["unidad_medida"].str.strip()
+
+        cartera_records = out.to_dict(orient="records")
         logger.info(f"Extracted {len(cartera_records)} records from Cartera data")
         return cartera_records
     
@@ -224,45 +296,32 @@ class CarteraService:
         text = text.strip()
         if not text:
             return "", ""
-        
+
         # Pattern to match code followed by name
         # Looks for digits followed by optional spaces and then the name
-        match = re.match(r'^(\d+(?:\.\d+)?)\s+(.+)$', text.strip())
-        if match:
-            code = match.group(1).strip()
-            name = match.group(2).strip()
-            return code, name
-        
-        # Alternative pattern for longer codes like the example "3000001 ACCIONES COMUNES"
-        match = re.match(r'^(\d{3,})\s+(.+)$', text.strip())
+        match = _CODE_NAME_RE.match(text)
         if match:
-            code = match.group(1).strip()
-            name = match.group(2).strip()
-            return code, name
-        
+            return match.group(1).strip(), match.group(2).strip()
+
         # If no match found, return empty code and full text as name
         return "", text
 
     def _normalize_text(self, text: str) -> str:
         """Normalize text for comparison (same as in extractor_service)"""
-        import unicodedata
         # Convert to lowercase and normalize unicode characters
         text = str(text).lower()
         # Remove accents and special characters
         text = unicodedata.normalize('NFKD', text).encode('ascii', errors='ignore').decode()
-        # Remove common punctuation and special characters that might appear in headers
-        import re
         # Replace common punctuation with spaces and remove special characters
-        text = re.sub(r'[\\s\\-\\_\\.\\,\\:]+', ' ', text)  # Replace multiple spaces, hyphens, underscores, dots, commas, colons with single space
+        text = _PUNCT_RE.sub(' ', text)
         # Remove non-alphanumeric characters but keep spaces
-        text = re.sub(r'[^a-z0-9\\s]', '', text)
+        text = _NON_ALNUM_RE.sub('', text)
         # Remove extra whitespace
         text = ' '.join(text.split())
         # Remove common words that might appear in headers
-        text = re.sub(r'\\b(el|la|de|del|al|a|e|i|o|u)\\b', '', text)
+        text = _STOPWORD_RE.sub('', text)
         # Remove extra spaces again after removing common words
-        text = ' '.join(text.split())
-        return text
+        return ' '.join(text.split())
 
     def store_cartera_data(self, cartera_data: Dict, session: Session, anio: int) -> Dict:
         """
@@ -272,56 +331,79 @@ class CarteraService:
         """
         try:
             cartera_records = cartera_data.get("cartera", [])
-            stored_count = 0
-            updated_count = 0
-            
+
+            # Una sola consulta precarga los ids existentes del año por
+            # jerarquía de códigos, en lugar de un SELECT por registro
+            existing_by_codes = {
+                (prog, prod, act, sub): row_id
+                for row_id, prog, prod, act, sub in session.exec(
+                    select(
+                        CarteraServicios.id,
+                        CarteraServicios.programa_codigo,
+                        CarteraServicios.producto_codigo,
+                        CarteraServicios.actividad_codigo,
+                        CarteraServicios.sub_producto_codigo,
+                    ).where(CarteraServicios.anio == anio)
+                ).all()
+            }
+
+            now = datetime.now()
+            new_by_codes = {}
+            update_rows = []
+
             for record in cartera_records:
-                # Extract identifiers
-                prog_cod = record.get("programa_codigo", "")
-                prod_cod = record.get("producto_codigo", "")
-                act_cod = record.get("actividad_codigo", "")
-                sub_cod = record.get("sub_producto_codigo", "")
-
-                # Search for existing record for the same year and code hierarchy
-                existing = session.exec(
-                    select(CarteraServicios).where(
-                        CarteraServicios.anio == anio,
-                        CarteraServicios.programa_codigo == prog_cod,
-                        CarteraServicios.producto_codigo == prod_cod,
-                        CarteraServicios.actividad_codigo == act_cod,
-                        CarteraServicios.sub_producto_codigo == sub_cod
-                    )
-                ).first()
-
-                if existing:
+                key = (
+                    record.get("programa_codigo", ""),
+                    record.get("producto_codigo", ""),
+                    record.get("actividad_codigo", ""),
+                    record.get("sub_producto_codigo", ""),
+                )
+                if key in existing_by_codes:
                     # Update existing record names and attributes (in case they changed in the catalog)
-                    existing.programa_nombre = record.get("programa_nombre", "")
-                    existing.producto_nombre = record.get("producto_nombre", "")
-                    existing.actividad_nombre = record.get("actividad_nombre", "")
-                    existing.sub_producto_nombre = record.get("sub_producto_nombre", "")
-                    existing.trazador = record.get("trazador", "")
-                    existing.unidad_medida = record.get("unidad_medida", "")
-                    existing.fecha_actualizacion = datetime.now()
-                    session.add(existing)
-                    updated_count += 1
+                    update_rows.append({
+                        "id": existing_by_codes[key],
+                        "programa_nombre": record.get("programa_nombre", ""),
+                        "producto_nombre": record.get("producto_nombre", ""),
+                        "actividad_nombre": record.get("actividad_nombre", ""),
+                        "sub_producto_nombre": record.get("sub_producto_nombre", ""),
+                        "trazador": record.get("trazador", ""),
+                        "unidad_medida": record.get("unidad_medida", ""),
+                        "fecha_actualizacion": now,
+                    })
                 else:
-                    # Create new record
-                    new_cartera = CarteraServicios(
-                        anio=anio,
-                        programa_codigo=prog_cod,
-                        programa_nombre=record.get("programa_nombre", ""),
-                        producto_codigo=prod_cod,
-                        producto_nombre=record.get("producto_nombre", ""),
-                        actividad_codigo=act_cod,
-                        actividad_nombre=record.get("actividad_nombre", ""),
-                        sub_producto_codigo=sub_cod,
-                        sub_producto_nombre=record.get("sub_producto_nombre", ""),
-                        trazador=record.get("trazador", ""),
-                        unidad_medida=record.get("unidad_medida", "")
-                    )
-                    session.add(new_cartera)
-                    stored_count += 1
-            
+                    # Filas nuevas como dicts para el INSERT masivo; una clave
+                    # repetida dentro del archivo sobreescribe la anterior
+                    # (mismo resultado final que el upsert fila a fila)
+                    new_by_codes[key] = {
+                        "anio": anio,
+                        "programa_codigo": key[0],
+                        "programa_nombre": record.get("programa_nombre", ""),
+                        "producto_codigo": key[1],
+                        "producto_nombre": record.get("producto_nombre", ""),
+                        "actividad_codigo": key[2],
+                        "actividad_nombre": record.get("actividad_nombre", ""),
+                        "sub_producto_codigo": key[3],
+                        "sub_producto_nombre": record.get("sub_producto_nombre", ""),
+                        "trazador": record.get("trazador", ""),
+                        "unidad_medida": record.get("unidad_medida", ""),
+                        "fecha_creacion": now,
+                    }
+
+            # INSERT y UPDATE masivos (executemany por lotes del driver) en
+            # lugar de una sentencia por objeto del unit-of-work. Los lotes
+            # de 1000 (igual que insertmanyvalues_page_size) acotan el buffer
+            # de parámetros por sentencia con carteras grandes
+            new_rows = iter(new_by_codes.values())
+            while chunk := list(islice(new_rows, 1000)):
+                session.execute(insert(CarteraServicios), chunk)
+            # UPDATE masivo por clave primaria: cada dict lleva el id y
+            # las columnas a actualizar
+            pending_updates = iter(update_rows)
+            while chunk := list(islice(pending_updates, 1000)):
+                session.execute(update(CarteraServicios), chunk)
+
+            stored_count = len(new_by_codes)
+            updated_count = len(update_rows)
             session.commit()
             logger.info(f"Successfully processed Cartera for year {anio}: {stored_count} new, {updated_count} updated")
             
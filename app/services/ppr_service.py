@@ -1,8 +1,11 @@
 from typing import List, Dict
 from datetime import datetime
+import pandas as pd
+from sqlalchemy import insert, literal
 from sqlmodel import Session, select
 from app.models.ppr import PPR, Producto, Actividad, Subproducto
 from app.models.programacion import ProgramacionPPR, ProgramacionCEPLAN
+from app.models.constants import MONTHS, MONTH_VALUE_FIELDS
 from app.core.logging_config import get_logger
 from app.schemas.ppr import SubproductProgrammingUpdate
 
@@ -74,109 +77,151 @@ def synchronize_ppr_with_cartera(year: int, session: Session) -> Dict:
         logger.warning(f"No Cartera records found for year {year} to synchronize.")
         return {"created_pprs": [], "total_new_subproducts": 0, "message": "No hay datos en la cartera para sincronizar."}
 
-    # Tracking metrics
-    new_ppr_count = 0
-    new_subproduct_count = 0
-    synced_ppr_ids = []
+    # 2. Crear los faltantes nivel por nivel: precargar lo existente en un
+    # dict, acumular los nuevos y hacer un único flush por nivel para obtener
+    # las PK, en lugar de un SELECT + flush por registro de la cartera.
+    # Los duplicados de cada nivel se eliminan con drop_duplicates (Cython)
+    # en vez de chequear claves fila por fila en Python.
+    df = pd.DataFrame([{
+        'programa_codigo': r.programa_codigo,
+        'programa_nombre': r.programa_nombre,
+        'producto_codigo': r.producto_codigo,
+        'producto_nombre': r.producto_nombre,
+        'actividad_codigo': r.actividad_codigo,
+        'actividad_nombre': r.actividad_nombre,
+        'sub_producto_codigo': r.sub_producto_codigo,
+        'sub_producto_nombre': r.sub_producto_nombre,
+        'unidad_medida': r.unidad_medida,
+    } for r in cartera_records])
 
-    # 2. Group by hierarchy and process
-    # We iterate through each record to ensure the full path exists
-    for record in cartera_records:
-        # A. Find or Create PPR
-        ppr = session.exec(
-            select(PPR).where(PPR.codigo_ppr == record.programa_codigo, PPR.anio == year)
-        ).first()
-
-        if not ppr:
+    # A. PPRs
+    # Del preexistente solo se usan id y código: proyectar las dos columnas
+    # evita hidratar filas ORM completas solo para el chequeo de duplicados
+    pprs_by_code = {
+        p.codigo_ppr: p
+        for p in session.exec(
+            select(PPR.id_ppr, PPR.codigo_ppr).where(PPR.anio == year)
+        ).all()
+    }
+    new_pprs = []
+    for row in df.drop_duplicates(subset=['programa_codigo']).itertuples():
+        if row.programa_codigo not in pprs_by_code:
             ppr = PPR(
-                codigo_ppr=record.programa_codigo,
-                nombre_ppr=record.programa_nombre,
+                codigo_ppr=row.programa_codigo,
+                nombre_ppr=row.programa_nombre,
                 anio=year,
                 estado="activo"
             )
-            session.add(ppr)
-            session.flush() # Get ID
-            new_ppr_count += 1
-            logger.info(f"Created new PPR: {ppr.codigo_ppr}")
-        
-        if ppr.id_ppr not in synced_ppr_ids:
-            synced_ppr_ids.append(ppr.id_ppr)
+            pprs_by_code[row.programa_codigo] = ppr
+            new_pprs.append(ppr)
+            logger.info(f"Creating new PPR: {ppr.codigo_ppr}")
+    if new_pprs:
+        session.add_all(new_pprs)
+        session.flush()
+    new_ppr_count = len(new_pprs)
+    synced_ppr_ids = [
+        pprs_by_code[codigo].id_ppr for codigo in df['programa_codigo'].unique()
+    ]
 
-        # B. Find or Create Producto
-        producto = session.exec(
-            select(Producto).where(
-                Producto.codigo_producto == record.producto_codigo,
-                Producto.id_ppr == ppr.id_ppr
-            )
-        ).first()
-
-        if not producto:
+    # B. Productos
+    ppr_ids = [p.id_ppr for p in pprs_by_code.values()]
+    productos_by_key = {
+        (pr.id_ppr, pr.codigo_producto): pr
+        for pr in session.exec(select(Producto).where(Producto.id_ppr.in_(ppr_ids))).all()
+    }
+    new_productos = []
+    for row in df.drop_duplicates(subset=['programa_codigo', 'producto_codigo']).itertuples():
+        ppr = pprs_by_code[row.programa_codigo]
+        key = (ppr.id_ppr, row.producto_codigo)
+        if key not in productos_by_key:
             producto = Producto(
-                codigo_producto=record.producto_codigo,
-                nombre_producto=record.producto_nombre,
+                codigo_producto=row.producto_codigo,
+                nombre_producto=row.producto_nombre,
                 id_ppr=ppr.id_ppr
             )
-            session.add(producto)
-            session.flush()
-            logger.info(f"Created new Producto: {producto.codigo_producto} for PPR {ppr.codigo_ppr}")
-
-        # C. Find or Create Actividad
-        actividad = session.exec(
-            select(Actividad).where(
-                Actividad.codigo_actividad == record.actividad_codigo,
-                Actividad.id_producto == producto.id_producto
-            )
-        ).first()
+            productos_by_key[key] = producto
+            new_productos.append(producto)
+            logger.info(f"Creating new Producto: {producto.codigo_producto} for PPR {ppr.codigo_ppr}")
+    if new_productos:
+        session.add_all(new_productos)
+        session.flush()
 
-        if not actividad:
+    # C. Actividades
+    producto_ids = [pr.id_producto for pr in productos_by_key.values()]
+    actividades_by_key = {
+        (a.id_producto, a.codigo_actividad): a
+        for a in session.exec(select(Actividad).where(Actividad.id_producto.in_(producto_ids))).all()
+    }
+    new_actividades = []
+    for row in df.drop_duplicates(subset=['programa_codigo', 'producto_codigo', 'actividad_codigo']).itertuples():
+        ppr = pprs_by_code[row.programa_codigo]
+        producto = productos_by_key[(ppr.id_ppr, row.producto_codigo)]
+        key = (producto.id_producto, row.actividad_codigo)
+        if key not in actividades_by_key:
             actividad = Actividad(
-                codigo_actividad=record.actividad_codigo,
-                nombre_actividad=record.actividad_nombre,
+                codigo_actividad=row.actividad_codigo,
+                nombre_actividad=row.actividad_nombre,
                 id_producto=producto.id_producto
             )
-            session.add(actividad)
-            session.flush()
-            logger.info(f"Created new Actividad: {actividad.codigo_actividad} for Producto {producto.codigo_producto}")
+            actividades_by_key[key] = actividad
+            new_actividades.append(actividad)
+            logger.info(f"Creating new Actividad: {actividad.codigo_actividad} for Producto {producto.codigo_producto}")
+    if new_actividades:
+        session.add_all(new_actividades)
+        session.flush()
 
-        # D. Find or Create Subproducto
-        subproducto = session.exec(
-            select(Subproducto).where(
-                Subproducto.codigo_subproducto == record.sub_producto_codigo,
-                Subproducto.id_actividad == actividad.id_actividad
-            )
-        ).first()
-
-        if not subproducto:
+    # D. Subproductos
+    actividad_ids = [a.id_actividad for a in actividades_by_key.values()]
+    subproductos_by_key = {
+        (s.id_actividad, s.codigo_subproducto): s
+        for s in session.exec(select(Subproducto).where(Subproducto.id_actividad.in_(actividad_ids))).all()
+    }
+    new_subproductos = []
+    for row in df.drop_duplicates(subset=['programa_codigo', 'producto_codigo', 'actividad_codigo', 'sub_producto_codigo']).itertuples():
+        ppr = pprs_by_code[row.programa_codigo]
+        producto = productos_by_key[(ppr.id_ppr, row.producto_codigo)]
+        actividad = actividades_by_key[(producto.id_producto, row.actividad_codigo)]
+        key = (actividad.id_actividad, row.sub_producto_codigo)
+        if key not in subproductos_by_key:
             subproducto = Subproducto(
-                codigo_subproducto=record.sub_producto_codigo,
-                nombre_subproducto=record.sub_producto_nombre,
-                unidad_medida=record.unidad_medida,
+                codigo_subproducto=row.sub_producto_codigo,
+                nombre_subproducto=row.sub_producto_nombre,
+                unidad_medida=row.unidad_medida,
                 id_actividad=actividad.id_actividad
             )
-            session.add(subproducto)
-            session.flush()
-            new_subproduct_count += 1
-            logger.info(f"Created new Subproducto: {subproducto.codigo_subproducto}")
+            subproductos_by_key[key] = subproducto
+            new_subproductos.append(subproducto)
+            logger.info(f"Creating new Subproducto: {subproducto.codigo_subproducto}")
+    if new_subproductos:
+        session.add_all(new_subproductos)
+        session.flush()
+    new_subproduct_count = len(new_subproductos)
 
-            # E. Initialize Programming (PPR and CEPLAN) for NEW subproducts only
-            session.add(ProgramacionPPR(
-                id_subproducto=subproducto.id_subproducto,
-                anio=year,
-                meta_anual=0.0,
-                prog_ene=0.0, ejec_ene=0.0, prog_feb=0.0, ejec_feb=0.0, prog_mar=0.0, ejec_mar=0.0,
-                prog_abr=0.0, ejec_abr=0.0, prog_may=0.0, ejec_may=0.0, prog_jun=0.0, ejec_jun=0.0,
-                prog_jul=0.0, ejec_jul=0.0, prog_ago=0.0, ejec_ago=0.0, prog_sep=0.0, ejec_sep=0.0,
-                prog_oct=0.0, ejec_oct=0.0, prog_nov=0.0, ejec_nov=0.0, prog_dic=0.0, ejec_dic=0.0
-            ))
-            
-            session.add(ProgramacionCEPLAN(
-                id_subproducto=subproducto.id_subproducto,
-                anio=year,
-                prog_ene=0.0, ejec_ene=0.0, prog_feb=0.0, ejec_feb=0.0, prog_mar=0.0, ejec_mar=0.0,
-                prog_abr=0.0, ejec_abr=0.0, prog_may=0.0, ejec_may=0.0, prog_jun=0.0, ejec_jun=0.0,
-                prog_jul=0.0, ejec_jul=0.0, prog_ago=0.0, ejec_ago=0.0, prog_sep=0.0, ejec_sep=0.0,
-                prog_oct=0.0, ejec_oct=0.0, prog_nov=0.0, ejec_nov=0.0, prog_dic=0.0, ejec_dic=0.0
-            ))
+    # E. Initialize Programming (PPR and CEPLAN) for NEW subproducts only.
+    # INSERT ... SELECT: las filas en cero se generan en la base a partir de
+    # los ids nuevos; solo viajan los ids, no 26 columnas por fila
+    if new_subproductos:
+        new_ids = [s.id_subproducto for s in new_subproductos]
+        month_cols = list(MONTH_VALUE_FIELDS)
+        now = datetime.now()
+
+        def _zero_select(*extra_literals):
+            return select(
+                Subproducto.id_subproducto,
+                literal(year),
+                *extra_literals,
+                *(literal(0.0) for _ in month_cols),
+                literal(now),
+            ).where(Subproducto.id_subproducto.in_(new_ids))
+
+        session.execute(insert(ProgramacionPPR).from_select(
+            ["id_subproducto", "anio", "meta_anual"] + month_cols + ["fecha_creacion"],
+            _zero_select(literal(0.0)),
+        ))
+        session.execute(insert(ProgramacionCEPLAN).from_select(
+            ["id_subproducto", "anio"] + month_cols + ["fecha_creacion"],
+            _zero_select(),
+        ))
 
     session.commit()
     logger.info(f"Synchronization complete for year {year}. New PPRs: {new_ppr_count}, New Subproducts: {new_subproduct_count}")
@@ -203,7 +248,6 @@ def sync_ppr_with_ceplan_data(year: int, session: Session, sync_metas: bool = Tr
         return {"count": 0, "message": f"No se encontraron datos de CEPLAN para el año {year}"}
     
     updated_count = 0
-    months = ['ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sep', 'oct', 'nov', 'dic']
     
     for cp in ceplan_records:
         # 2. Buscar el registro PPR correspondiente
@@ -218,7 +262,7 @@ def sync_ppr_with_ceplan_data(year: int, session: Session, sync_metas: bool = Tr
             # 3. Copiar valores de programación/ejecución
             updated = False
             total_meta = 0.0
-            for m in months:
+            for m in MONTHS:
                 if sync_metas:
                     val = getattr(cp, f"prog_{m}", 0.0) or 0.0
                     setattr(ppr_prog, f"prog_{m}", val)
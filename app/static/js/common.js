@@ -3,12 +3,31 @@
 // --- UTILIDADES GLOBALES (Si no están en main.js) ---
 
 // --- FUNCIONES DE PPR ---
+
+// GET /pprs pagina por keyset (limit + next_cursor): seguir el cursor hasta
+// agotarlo para obtener la lista completa que esperan las tablas y filtros
+async function fetchAllPPRs(anio = null) {
+    const pprs = [];
+    let cursor = null;
+    do {
+        const params = new URLSearchParams();
+        if (anio) params.set('anio', anio);
+        if (cursor) params.set('cursor', cursor);
+        const qs = params.toString();
+        const response = await callAPI(`/pprs${qs ? '?' + qs : ''}`, 'GET');
+        if (!response || !response.data) break;
+        pprs.push(...response.data);
+        cursor = response.next_cursor;
+    } while (cursor);
+    return pprs;
+}
+
 async function initialSetup(defaultYear) {
     try {
-        const response = await callAPI('/pprs', 'GET');
+        const pprs = await fetchAllPPRs();
         const yearFilter = document.getElementById('yearFilter');
-        if (response && response.data && yearFilter) {
-            let years = [...new Set(response.data.map(ppr => ppr.anio))];
+        if (yearFilter) {
+            let years = [...new Set(pprs.map(ppr => ppr.anio))];
             if (!years.includes(defaultYear)) years.push(defaultYear);
             years.sort((a, b) => b - a);
             yearFilter.innerHTML = '';
@@ -29,15 +48,13 @@ function initializeTabEventListeners() {
 
 async function loadPPRs(anio = null) {
     try {
-        const url = anio ? `/pprs?anio=${anio}` : '/pprs';
-        const response = await callAPI(url, 'GET');
+        const pprs = await fetchAllPPRs(anio);
         const tbody = document.getElementById('pprTableBody');
         if(!tbody) return;
         tbody.innerHTML = '';
-        if (response && response.data) {
-            response.data.forEach(ppr => {
-                const row = document.createElement('tr');
-                row.innerHTML = `
+        pprs.forEach(ppr => {
+            const row = document.createElement('tr');
+            row.innerHTML = `
                     <td class="ps-4 fw-bold text-muted small">#${ppr.codigo_ppr}</td>
                     <td class="fw-bold text-primary">${ppr.nombre_ppr}</td>
                     <td class="text-center fw-bold">${ppr.anio}</td>
@@ -49,9 +66,8 @@ async function loadPPRs(anio = null) {
                         <button class="btn btn-sm btn-outline-success border-0 me-1" onclick="runComparison(${ppr.id_ppr}, '${ppr.nombre_ppr}')" title="Comparar"><i class="fas fa-scale-unbalanced"></i></button>
                         <button class="btn btn-sm btn-outline-danger border-0" onclick="deletePPR(${ppr.id_ppr}, '${ppr.nombre_ppr}')" title="Eliminar"><i class="fas fa-trash-can"></i></button>
                     </td>`;
-                tbody.appendChild(row);
-            });
-        }
+            tbody.appendChild(row);
+        });
     } catch (e) { console.error(e); }
 }
 
@@ -280,10 +296,10 @@ function changeCarteraPage(page) {
 async function manageResponsibles(id, name) { /* Implementar según necesidad similar a dashboards */ }
 async function openDeleteByYearModal() {
     try {
-        const res = await callAPI('/pprs', 'GET');
+        const pprs = await fetchAllPPRs();
         const sel = document.getElementById('yearToDelete');
-        if(sel && res.data) {
-            const years = [...new Set(res.data.map(p => p.anio))].sort((a,b)=>b-a);
+        if(sel) {
+            const years = [...new Set(pprs.map(p => p.anio))].sort((a,b)=>b-a);
             sel.innerHTML = '';
             years.forEach(y => sel.add(new Option(y, y)));
         }
@@ -300,17 +316,33 @@ async function confirmDeleteByYear() {
 }
 
 // --- FUNCIONES DE USUARIOS ---
+
+// GET /users pagina por limit/offset (tope 500 por página): recorrer las
+// páginas hasta recibir una incompleta para obtener la lista completa
+async function fetchAllUsers() {
+    const users = [];
+    const pageSize = 500;
+    let offset = 0;
+    while (true) {
+        const page = await callAPI(`/users?limit=${pageSize}&offset=${offset}`, 'GET');
+        if (!Array.isArray(page) || page.length === 0) break;
+        users.push(...page);
+        if (page.length < pageSize) break;
+        offset += pageSize;
+    }
+    return users;
+}
+
 async function loadUsers() {
     try {
-        const response = await callAPI('/users', 'GET');
+        const users = await fetchAllUsers();
         const tbody = document.getElementById('userTableBody');
         if (!tbody) return;
         tbody.innerHTML = '';
-        
-        if (response && Array.isArray(response)) {
-            response.forEach(user => {
-                const row = document.createElement('tr');
-                row.innerHTML = `
+
+        users.forEach(user => {
+            const row = document.createElement('tr');
+            row.innerHTML = `
                     <td class="ps-4 fw-bold text-muted small">#${user.id_usuario}</td>
                     <td class="fw-bold">${user.nombre}</td>
                     <td><i class="fas fa-envelope me-2 text-muted small"></i>${user.email}</td>
@@ -322,9 +354,8 @@ async function loadUsers() {
                         <button class="btn btn-action btn-outline-danger" onclick="deleteUser(${user.id_usuario}, '${user.nombre}')" title="Eliminar"><i class="fas fa-trash"></i></button>
                     </td>
                 `;
-                tbody.appendChild(row);
-            });
-        }
+            tbody.appendChild(row);
+        });
     } catch (e) { showError('Error al cargar usuarios'); }
 }
 